@@ -0,0 +1,210 @@
+"""
+Download the clips of every camera event since the last run, several at a time.
+
+Events newer than the saved cursor are listed from the camera's motion and
+person traits, clip previews are generated concurrently and each clip is
+streamed to disk in chunks. Interrupted downloads resume with a Range request,
+and events already fetched are skipped by eventId.
+
+Usage:
+    $ python clip_fetcher.py
+    $ python clip_fetcher.py --output clips --workers 8
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from dotenv import load_dotenv
+
+from sdm_session import SdmSession, parse_timestamp
+
+# Load environment variables from .env file
+load_dotenv()
+
+PROJECT_ID = os.getenv("PROJECT_ID")
+
+# Device traits holding camera events
+EVENT_TRAITS = {
+    "sdm.devices.traits.CameraMotion": "motion",
+    "sdm.devices.traits.CameraPerson": "person",
+}
+
+
+def list_events(session, device_id, since=None):
+    """Motion and person events of the camera newer than `since`, oldest first."""
+    response = session.get(device_id)
+    response.raise_for_status()
+    traits = response.json().get("traits", {})
+    cursor = parse_timestamp(since) if since else None
+    events = []
+    for trait, kind in EVENT_TRAITS.items():
+        for event in traits.get(trait, {}).get("events", {}).values():
+            if cursor is None or parse_timestamp(event["timestamp"]) > cursor:
+                events.append({"eventId": event["eventId"], "timestamp": event["timestamp"], "type": kind})
+    return sorted(events, key=lambda e: parse_timestamp(e["timestamp"]))
+
+
+def download_file(session, url, filename, chunk_size=1 << 20):
+    """Stream `url` to `filename` in chunks, resuming a previous partial download.
+
+    Data goes to `filename.part`, which is renamed once complete, so a file under
+    the final name is always whole. Returns the number of bytes written.
+    """
+    part = f"{filename}.part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 416:  # the partial file is already complete
+            os.replace(part, filename)
+            return 0
+        response.raise_for_status()
+        if response.status_code != 206:  # server ignored the range, start over
+            offset = 0
+        written = 0
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+    os.replace(part, filename)
+    return written
+
+
+class ClipFetcher:
+    """Fetch the clips of new camera events with at most `workers` downloads in flight.
+
+    The cursor (timestamp of the newest event fetched without gaps) and the
+    eventIds at or after it are kept in `state_file`, so a restart continues
+    where the last run stopped and never downloads an event twice.
+    """
+
+    def __init__(self, session, device_id, output="clips", workers=4, state_file=None, chunk_size=1 << 20):
+        self.session = session
+        self.device_id = device_id
+        self.output = output
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.state_file = state_file or os.path.join(output, "fetch_state.json")
+        self._lock = threading.Lock()
+        os.makedirs(output, exist_ok=True)
+
+        self.cursor = None
+        self.fetched = {}  # eventId -> timestamp
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.cursor = state.get("cursor")
+            self.fetched = state.get("fetched", {})
+
+    def _save_state(self):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"cursor": self.cursor, "fetched": self.fetched}, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def clip_path(self, event):
+        timestamp = event["timestamp"].replace(":", "-")
+        return os.path.join(self.output, f"{timestamp}_{event['type']}_{event['eventId'][-12:]}.mp4")
+
+    def fetch_event(self, event):
+        """Generate the clip preview of one event and download it, returns the clip path."""
+        results = self.session.execute_command(
+            self.device_id, "sdm.devices.commands.CameraClipPreview.GenerateClipPreview",
+            {"eventId": event["eventId"]})
+        url = results.get("previewClipUrl")
+        if not url:
+            raise ValueError(f"No clip preview for event {event['eventId']}")
+        path = self.clip_path(event)
+        download_file(self.session, url, path, self.chunk_size)
+        return path
+
+    def fetch(self, event):
+        """Fetch one event's clip unless it was fetched before, returns the path or None if skipped."""
+        with self._lock:
+            if event["eventId"] in self.fetched:
+                return None
+            self.fetched[event["eventId"]] = event["timestamp"]  # claimed, so concurrent duplicates are skipped
+        try:
+            path = self.fetch_event(event)
+        except Exception:
+            with self._lock:
+                del self.fetched[event["eventId"]]
+            raise
+        with self._lock:
+            self._save_state()
+        return path
+
+    def _advance(self, events, done):
+        # Move the cursor past the leading run of finished events; failed ones are retried next time
+        with self._lock:
+            for event in events:
+                if event["eventId"] not in done:
+                    break
+                self.cursor = event["timestamp"]
+            cursor = parse_timestamp(self.cursor) if self.cursor else None
+            self.fetched = {k: t for k, t in self.fetched.items()
+                            if cursor is None or (t and parse_timestamp(t) >= cursor)}
+            self._save_state()
+
+    def fetch_new(self, on_clip=None):
+        """Fetch every event since the cursor, calls on_clip(event, path) as each clip lands.
+
+        Returns the list of (event, path) downloaded in this call.
+        """
+        events = [e for e in list_events(self.session, self.device_id, self.cursor) if e["eventId"] not in self.fetched]
+        done = set(self.fetched)
+        clips = []
+        if not events:
+            return clips
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="clip-fetch") as pool:
+            futures = {pool.submit(self.fetch_event, e): e for e in events}
+            for future in as_completed(futures):
+                event = futures[future]
+                try:
+                    path = future.result()
+                except (requests.RequestException, ValueError, OSError) as e:
+                    print(f"Failed to fetch clip of event {event['eventId']}: {e}")
+                    continue
+                with self._lock:
+                    self.fetched[event["eventId"]] = event["timestamp"]
+                done.add(event["eventId"])
+                clips.append((event, path))
+                print(f"Saved {event['type']} clip {path}")
+                if on_clip is not None:
+                    on_clip(event, path)
+        self._advance(events, done)
+        print(f"Fetched {len(clips)}/{len(events)} clips in {time.perf_counter() - t0:.1f}s")
+        return clips
+
+
+def main(opt):
+    # Tokens and the device list are cached between runs
+    session = SdmSession(PROJECT_ID, pool_size=max(opt.workers, 10))
+    device_id = session.camera_device_id()
+    if not device_id:
+        print("No camera device found.")
+        return
+    fetcher = ClipFetcher(session, device_id, opt.output, opt.workers)
+    while True:
+        fetcher.fetch_new()
+        if not opt.interval:
+            break
+        time.sleep(opt.interval)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, default="clips", help="directory for clips and the fetch state")
+    parser.add_argument("--workers", type=int, default=4, help="clips generated and downloaded in parallel")
+    parser.add_argument("--interval", type=float, default=0, help="poll again every N seconds, 0 to run once")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
@@ -0,0 +1,270 @@
+"""
+Ingest camera events as they are pushed instead of polling the device traits.
+
+Event messages from a subscriber (Google Pub/Sub, or a local JSON-lines file or
+UDP socket for testing) are dispatched immediately: the clip preview is
+generated and downloaded on a thread pool, then the clip is run through the bin
+motion pipeline and, with --weights, the YOLOv5 classifier.
+
+Usage:
+    $ python event_ingest.py --pubsub projects/<gcp-project>/subscriptions/<subscription>
+    $ python event_ingest.py --file events.jsonl
+    $ python event_ingest.py --udp 9999 --weights yolov5/runs/train/exp/weights/best.pt
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from clip_fetcher import ClipFetcher
+from sdm_session import SdmSession
+
+# Make the livestream motion pipeline importable
+LIVESTREAM = Path(__file__).resolve().parent / 'src_livestream'
+if str(LIVESTREAM) not in sys.path:
+    sys.path.append(str(LIVESTREAM))
+
+from bin_layout import DEFAULT_LAYOUT, load_layout
+from replay import replay_video
+
+# Load environment variables from .env file
+load_dotenv()
+
+PROJECT_ID = os.getenv("PROJECT_ID")
+
+# SDM event types that come with a clip
+EVENT_TYPES = {
+    "sdm.devices.events.CameraMotion.Motion": "motion",
+    "sdm.devices.events.CameraPerson.Person": "person",
+}
+
+
+def parse_event_message(payload):
+    """Camera events of one SDM event message (bytes, str or dict); other updates give an empty list.
+
+    Messages without a timestamp are stamped with the time they were parsed.
+    """
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    update = payload.get("resourceUpdate", {})
+    timestamp = payload.get("timestamp")
+    if not timestamp:
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+    events = []
+    for name, event in update.get("events", {}).items():
+        if name in EVENT_TYPES:
+            events.append({"eventId": event["eventId"], "timestamp": timestamp, "type": EVENT_TYPES[name],
+                           "device": update.get("name")})
+    return events
+
+
+class EventSubscriber(ABC):
+    """Source of SDM event messages.
+
+    `run(callback)` blocks and calls callback(payload) for every message until
+    `close()` is called from another thread.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+
+    @abstractmethod
+    def run(self, callback):
+        pass
+
+    def close(self):
+        self._stop.set()
+
+
+class PubSubSubscriber(EventSubscriber):
+    """Streaming pull from the Pub/Sub subscription of the SDM project."""
+
+    def __init__(self, subscription):
+        super().__init__()
+        from google.cloud import pubsub_v1  # scoped so Pub/Sub is only required for this subscriber
+        self.subscription = subscription
+        self.client = pubsub_v1.SubscriberClient()
+        self._future = None
+
+    def run(self, callback):
+        def on_message(message):
+            try:
+                callback(message.data)
+            finally:
+                message.ack()
+
+        self._future = self.client.subscribe(self.subscription, on_message)
+        with self.client:
+            try:
+                self._future.result()
+            except Exception as e:
+                if not self._stop.is_set():
+                    raise
+                print(f"Subscription closed: {e}")
+
+    def close(self):
+        super().close()
+        if self._future is not None:
+            self._future.cancel()
+
+
+class FileSubscriber(EventSubscriber):
+    """Read messages from a JSON-lines file, following appended lines like `tail -f` when `follow` is set."""
+
+    def __init__(self, path, follow=True, interval=0.2):
+        super().__init__()
+        self.path = path
+        self.follow = follow
+        self.interval = interval
+
+    def run(self, callback):
+        with open(self.path) as f:
+            while not self._stop.is_set():
+                line = f.readline()
+                if not line:
+                    if not self.follow:
+                        break
+                    self._stop.wait(self.interval)
+                    continue
+                if line.strip():
+                    callback(line)
+
+
+class UdpSubscriber(EventSubscriber):
+    """Receive one message per UDP datagram, e.g. from `nc -u localhost 9999 < message.json`."""
+
+    def __init__(self, port, host="127.0.0.1"):
+        super().__init__()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+
+    def run(self, callback):
+        with self.sock:
+            while not self._stop.is_set():
+                try:
+                    data, _ = self.sock.recvfrom(65535)
+                except socket.timeout:
+                    continue
+                callback(data)
+
+
+class EventDispatcher:
+    """Fetch the clip of each incoming event on a thread pool and run it through the bin pipeline.
+
+    Downloads run `workers` at a time; inference runs on its own thread so a
+    slow model never delays the next download.
+    """
+
+    def __init__(self, fetcher, profile=None, classifier=None, workers=4):
+        self.fetcher = fetcher
+        self.profile = profile
+        self.classifier = classifier
+        self.received = 0
+        self.failed = 0
+        self._downloads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="event-clip")
+        self._inference = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-inference")
+
+    def __call__(self, payload):
+        try:
+            events = parse_event_message(payload)
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"Ignoring malformed event message: {e}")
+            return
+        for event in events:
+            if event["device"] and event["device"] != self.fetcher.device_id:
+                continue
+            self.received += 1
+            event["received"] = time.time()
+            self._downloads.submit(self._fetch, event)
+
+    def _fetch(self, event):
+        try:
+            path = self.fetcher.fetch(event)
+        except Exception as e:
+            self.failed += 1
+            print(f"Failed to fetch clip of event {event['eventId']}: {e}")
+            return
+        if path is None:
+            return  # duplicate delivery
+        print(f"Saved {event['type']} clip {path} {time.time() - event['received']:.1f}s after the event arrived")
+        if self.profile is not None:
+            self._inference.submit(self._infer, event, path)
+
+    def _infer(self, event, path):
+        try:
+            r = replay_video(path, self.profile, classifier=self.classifier)
+        except Exception as e:
+            print(f"Failed to process clip {path}: {e}")
+            return
+        print(f"Event {event['eventId'][-12:]}: {r['events']} disposals {r['events_per_bin']}")
+        for disposal in r["disposals"]:
+            if disposal["classification"] is not None:
+                print(f"  {disposal['label']} at {disposal['start_time']:.1f}s: {disposal['classification']}")
+
+    def close(self):
+        self._downloads.shutdown(wait=True)
+        self._inference.shutdown(wait=True)
+
+
+def main(opt):
+    if opt.pubsub:
+        subscriber = PubSubSubscriber(opt.pubsub)
+    elif opt.file:
+        subscriber = FileSubscriber(opt.file, follow=not opt.once)
+    else:
+        subscriber = UdpSubscriber(opt.udp)
+
+    # Tokens and the device list are cached between runs
+    session = SdmSession(PROJECT_ID, pool_size=max(opt.workers, 10))
+    device_id = session.camera_device_id()
+    if not device_id:
+        print("No camera device found.")
+        return
+    classifier = None
+    if opt.weights:
+        from bin_detection_stream import load_classifier  # scoped so torch is only imported when enabled
+        classifier = load_classifier(opt.weights)
+    profile = load_layout(opt.layout)[opt.camera] if not opt.no_inference else None
+    dispatcher = EventDispatcher(ClipFetcher(session, device_id, opt.output, opt.workers), profile, classifier,
+                                 opt.workers)
+    try:
+        subscriber.run(dispatcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
+        dispatcher.close()
+        if classifier is not None:
+            classifier.close()
+        print(f"{dispatcher.received} events received, {dispatcher.failed} failed")
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pubsub", type=str, help="Pub/Sub subscription path of the SDM project")
+    source.add_argument("--file", type=str, help="JSON-lines file of event messages")
+    source.add_argument("--udp", type=int, help="local UDP port receiving event messages")
+    parser.add_argument("--once", action="store_true", help="stop at the end of --file instead of following it")
+    parser.add_argument("--output", type=str, default="clips", help="directory for clips and the fetch state")
+    parser.add_argument("--workers", type=int, default=4, help="clips generated and downloaded in parallel")
+    parser.add_argument("--layout", type=str, default=str(DEFAULT_LAYOUT), help="bin layout file")
+    parser.add_argument("--camera", type=str, default="recorded", help="camera profile of the layout")
+    parser.add_argument("--weights", type=str, default="", help="optional YOLOv5 model to classify disposals")
+    parser.add_argument("--no-inference", action="store_true", help="only download the clips")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
@@ -0,0 +1,210 @@
+"""
+Merge several YOLO (.txt) datasets into one, remapping their classes.
+
+Each source dataset in the spec file gets its own class mapping (source class
+id -> merged class id). Label files are remapped in parallel on a process pool
+and written atomically (temporary file + rename) into the merged dataset,
+images are hard-linked (or copied), and a data.yaml plus a manifest with
+per-class counts are written. The manifest records a content hash per label
+file, so a re-run only rewrites files whose source or mapping changed, and
+deletes the merged files whose source label file is gone.
+
+The spec is a YAML file:
+    output: merged                 # merged dataset directory
+    names: [glass, metal, ...]     # optional, otherwise taken from the source data.yaml files
+    datasets:
+      - name: zero_waste
+        path: datasets/zero-waste  # contains train/ valid/ test/ with images/ and labels/
+        mapping: {0: 2, 1: 14}     # source class -> merged class
+        drop_unmapped: false       # keep (default) or drop labels of unmapped classes
+
+Usage:
+    $ python resource/consolidate_datasets.py resource/datasets.yaml
+    $ python resource/consolidate_datasets.py resource/datasets.yaml --dry-run
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+IMG_FORMATS = ('.bmp', '.dng', '.jpeg', '.jpg', '.mpo', '.png', '.tif', '.tiff', '.webp', '.pfm')
+SPLITS = {'train': 'train', 'valid': 'val', 'val': 'val', 'test': 'test'}  # source split dir -> data.yaml key
+MANIFEST = 'manifest.json'
+
+
+def atomic_write(path, data):
+    """Write bytes to path through a temporary file in the same directory and a rename."""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def link_or_copy(src, dst):
+    if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src):
+        return
+    tmp = f'{dst}.{os.getpid()}.tmp'
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def remap_labels(data, mapping, drop_unmapped=False):
+    """Remap the class ids of a YOLO label file, returns (new bytes, per-class counts)."""
+    lines, counts = [], Counter()
+    for line in data.decode().splitlines():
+        elements = line.split()
+        if not elements:
+            continue
+        cls = int(float(elements[0]))
+        if cls in mapping:
+            cls = mapping[cls]
+        elif drop_unmapped:
+            continue
+        elements[0] = str(cls)
+        lines.append(' '.join(elements))
+        counts[cls] += 1
+    return ('\n'.join(lines) + '\n' if lines else '').encode(), counts
+
+
+def process_file(task):
+    """Remap one label file (runs in a worker process), returns its manifest entry."""
+    src, dst, image, image_dst, mapping, drop_unmapped, key, previous, dry_run = task
+    with open(src, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(key.encode() + data).hexdigest()
+    if (previous and previous['hash'] == digest and os.path.exists(dst)
+            and (image_dst is None or os.path.exists(image_dst))):
+        return {'hash': digest, 'counts': previous['counts'], 'status': 'unchanged'}
+
+    out, counts = remap_labels(data, mapping, drop_unmapped)
+    if not dry_run:
+        atomic_write(dst, out)
+        if image:
+            link_or_copy(image, image_dst)
+    return {'hash': digest, 'counts': {str(k): v for k, v in sorted(counts.items())}, 'status': 'written'}
+
+
+def remove_stale(output, rel):
+    """Delete a merged label file and its image."""
+    label = output / rel
+    images = label.parent.parent / 'images'
+    for path in [label, *(p for p in images.glob(f'{glob.escape(label.stem)}.*') if p.stem == label.stem)]:
+        path.unlink(missing_ok=True)
+
+
+def source_names(path):
+    """Class names from a dataset's data.yaml, or an empty list."""
+    for name in ('data.yaml', 'data.yml'):
+        if (path / name).exists():
+            with open(path / name, errors='ignore') as f:
+                names = (yaml.safe_load(f) or {}).get('names', [])
+            return list(names.values()) if isinstance(names, dict) else list(names)
+    return []
+
+
+def collect_tasks(spec, output, manifest, dry_run):
+    """One task per source label file, plus the merged class names derived from the sources."""
+    tasks, names = [], {}
+    for ds in spec['datasets']:
+        root = Path(ds['path'])
+        mapping = {int(k): int(v) for k, v in (ds.get('mapping') or {}).items()}
+        drop = bool(ds.get('drop_unmapped', False))
+        key = json.dumps([sorted(mapping.items()), drop])  # part of the hash, so mapping edits are re-applied
+        for i, name in enumerate(source_names(root)):
+            names.setdefault(mapping.get(i, i) if (i in mapping or not drop) else None, name)
+        for split in SPLITS:
+            labels_dir = root / split / 'labels'
+            if not labels_dir.is_dir():
+                continue
+            images = {p.stem: p for p in (root / split / 'images').glob('*') if p.suffix.lower() in IMG_FORMATS}
+            out_labels = output / SPLITS[split] / 'labels'
+            out_images = output / SPLITS[split] / 'images'
+            if not dry_run:
+                out_labels.mkdir(parents=True, exist_ok=True)
+                out_images.mkdir(parents=True, exist_ok=True)
+            for label in sorted(labels_dir.glob('*.txt')):
+                stem = f"{ds['name']}_{label.stem}"  # prefixed so files of different datasets never collide
+                image = images.get(label.stem)
+                rel = f"{SPLITS[split]}/labels/{stem}.txt"
+                tasks.append((rel, (str(label), str(out_labels / f'{stem}.txt'), str(image) if image else None,
+                                    str(out_images / (stem + image.suffix)) if image else None, mapping, drop,
+                                    key, manifest.get(rel), dry_run)))
+    names.pop(None, None)
+    return tasks, names
+
+
+def main(opt):
+    with open(opt.spec, errors='ignore') as f:
+        spec = yaml.safe_load(f)
+    output = Path(opt.output or spec.get('output', 'merged'))
+    manifest_path = output / MANIFEST
+    manifest = {}
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f).get('files', {})
+
+    t0 = time.perf_counter()
+    tasks, derived_names = collect_tasks(spec, output, manifest, opt.dry_run)
+    with ProcessPoolExecutor(max_workers=opt.workers) as pool:
+        results = list(pool.map(process_file, [t for _, t in tasks], chunksize=64))
+    files = {rel: result for (rel, _), result in zip(tasks, results)}
+
+    # Per-class and per-split counts over the whole merged dataset
+    class_counts, split_counts = Counter(), Counter()
+    for rel, result in files.items():
+        split_counts[rel.split('/')[0]] += 1
+        for cls, n in result['counts'].items():
+            class_counts[int(cls)] += n
+    nc = max([*class_counts, *derived_names, len(spec.get('names') or []) - 1, -1]) + 1
+    names = list(spec.get('names') or [derived_names.get(i, f'class{i}') for i in range(nc)])
+    written = sum(r['status'] == 'written' for r in results)
+    stale = [rel for rel in manifest if rel not in files]  # source label file removed since the last run
+    if not opt.dry_run:
+        for rel in stale:
+            remove_stale(output, rel)
+
+    print(f"{len(files)} label files, {written} {'to rewrite' if opt.dry_run else 'written'}, "
+          f"{len(files) - written} unchanged, {len(stale)} {'to remove' if opt.dry_run else 'removed'}, "
+          f"{time.perf_counter() - t0:.1f}s")
+    for i in range(nc):
+        print(f"  {i:3d} {names[i] if i < len(names) else '?':20s} {class_counts[i]}")
+    if opt.dry_run:
+        return
+
+    data = {'path': str(output.resolve()), **{k: f'{k}/images' for k in split_counts}, 'nc': nc, 'names': names}
+    atomic_write(output / 'data.yaml', yaml.safe_dump(data, sort_keys=False).encode())
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'spec': str(opt.spec),
+        'datasets': [{'name': ds['name'], 'path': str(ds['path'])} for ds in spec['datasets']],
+        'splits': dict(split_counts),
+        'classes': {names[i] if i < len(names) else str(i): class_counts[i] for i in range(nc)},
+        'files': files,
+    }
+    atomic_write(manifest_path, json.dumps(report, indent=1).encode())
+    print(f"Merged dataset saved to {output}")
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('spec', type=str, help='YAML spec of the source datasets and their class mappings')
+    parser.add_argument('--output', type=str, default='', help='merged dataset directory (overrides the spec)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would change and the class counts')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
@@ -1,5 +1,14 @@
 import cv2
 import os
+import sys
+from pathlib import Path
+
+# Read the bin layout shared with the livestream code
+LIVESTREAM = Path(__file__).resolve().parents[1] / 'src_livestream'
+if str(LIVESTREAM) not in sys.path:
+    sys.path.append(str(LIVESTREAM))
+
+from bin_layout import load_layout
 
 # Function to detect motion in a specified region of interest (ROI)
 def detect_motion(roi, first_frame, threshold=50):  # Increased threshold for better accuracy
@@ -31,12 +40,11 @@ if not ret:
     cap.release()
     exit()
 
-# Define bounding boxes for each bin
-bounding_boxes = [
-    (470, 0, 324, 450),  # Landfill bin
-    (820, 0, 350, 450),  # Recyclable bin
-    (1188, 0, 317, 450)  # Organic bin
-]
+# Load the bounding boxes and labels of each bin from the layout of the recorded clips
+profile = load_layout()['recorded']
+profile.validate(frame.shape)
+bounding_boxes = profile.bounding_boxes
+bin_labels = profile.bin_labels
 
 # Preprocess the first frame for each bounding box
 first_frames = []
@@ -45,9 +53,6 @@ for (x, y, w, h) in bounding_boxes:
     first_frame = cv2.GaussianBlur(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (21, 21), 0)
     first_frames.append(first_frame)
 
-# Define labels for the bins
-bin_labels = ['Landfill', 'Recyclable', 'Organics']
-
 while cap.isOpened():
     ret, frame = cap.read()
     if not ret:
@@ -0,0 +1,188 @@
+"""
+Monitor the bins straight from the camera's RTSP stream.
+
+The GenerateRtspStream command of request.json opens the stream, which is then
+decoded on its own thread and fed through the bin motion pipeline. Skipped
+frames are only grabbed, never decoded to an image, and the stream is extended
+before it expires and regenerated if it is lost.
+
+Usage:
+    $ python rtsp_stream.py --skip 2 --view
+    $ python rtsp_stream.py --print-url    # keep a stream open for yolov5/detect.py --source <url> (LoadStreams)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import requests
+from dotenv import load_dotenv
+
+from sdm_session import SdmSession, StreamKeeper, StreamLease
+
+# Make the livestream motion pipeline importable
+LIVESTREAM = Path(__file__).resolve().parent / 'src_livestream'
+if str(LIVESTREAM) not in sys.path:
+    sys.path.append(str(LIVESTREAM))
+
+from bin_layout import DEFAULT_LAYOUT, load_layout
+from bin_monitor import BinMonitor
+from pipeline import DROP_OLDEST, FramePipeline
+
+# Load environment variables from .env file
+load_dotenv()
+
+PROJECT_ID = os.getenv("PROJECT_ID")
+
+# GenerateRtspStream command body
+RTSP_REQUEST = Path(__file__).resolve().parent / 'request.json'
+
+
+class RtspSource:
+    """An RTSP stream of the camera that is kept alive for as long as it is open."""
+
+    def __init__(self, session, device_id, request=RTSP_REQUEST):
+        self.session = session
+        self.device_id = device_id
+        with open(request) as f:
+            self.body = json.load(f)
+        self.lease = None
+        self.keeper = None
+
+    @property
+    def url(self):
+        return self.lease.results['streamUrls']['rtspUrl']
+
+    def open(self):
+        """Generate a new stream (stopping the previous one) and start extending it, returns its URL."""
+        self.close()
+        results = self.session.execute_command(self.device_id, self.body['command'], self.body.get('params'))
+        self.lease = StreamLease('Rtsp', results)
+        self.keeper = StreamKeeper(self.session, self.device_id, self.lease).start()
+        return self.url
+
+    def expired(self):
+        return self.lease is None or self.lease.seconds_left() <= 0
+
+    def close(self):
+        if self.keeper is not None:
+            self.keeper.stop()
+            self.keeper = None
+
+
+class RtspGrabber:
+    """FramePipeline grab stage reading every (skip + 1)th frame of an RTSP stream.
+
+    Skipped frames are grab()bed without retrieve(), so they are demuxed but
+    never converted to BGR. The retrieved frame reuses the slot's buffer. A lost
+    stream is reopened, with a new stream generated once the old one expired.
+    """
+
+    def __init__(self, source, skip=0, reconnect_delay=2.0, max_failures=5):
+        self.source = source
+        self.skip = skip
+        self.reconnect_delay = reconnect_delay
+        self.max_failures = max_failures
+        self.grabbed = 0
+        self.reconnects = 0
+        self._cap = None
+        self._failures = 0
+
+    def _connect(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+            self.reconnects += 1
+            time.sleep(self.reconnect_delay)
+        url = self.source.open() if self.source.expired() else self.source.url
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # keep the decoder close to live
+        self._cap = cap
+
+    def __call__(self, frame):
+        while True:
+            if self._cap is None:
+                self._connect()
+            ok = all(self._cap.grab() for _ in range(self.skip + 1))
+            if ok:
+                ret, img = self._cap.retrieve(frame)
+                if ret:
+                    self._failures = 0
+                    self.grabbed += self.skip + 1
+                    return img
+            self._failures += 1
+            if self._failures > self.max_failures:
+                print("RTSP stream lost, giving up")
+                return False
+            print(f"RTSP stream lost, reconnecting ({self._failures}/{self.max_failures})")
+            self._connect()
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+def main(opt):
+    # Tokens and the device list are cached between runs
+    session = SdmSession(PROJECT_ID)
+    device_id = session.camera_device_id()
+    if not device_id:
+        print("No camera device found.")
+        return
+    source = RtspSource(session, device_id)
+
+    try:
+        if opt.print_url:
+            print(source.open())
+            while True:
+                time.sleep(1)
+
+        profile = load_layout(opt.layout)[opt.camera]
+        monitor = BinMonitor.from_profile(profile, privacy=opt.view and not opt.no_privacy)
+        grabber = RtspGrabber(source, skip=opt.skip)
+        window_name = "RTSP Stream"
+
+        def render(frame, meta):
+            if not opt.view:
+                return True
+            cv2.imshow(window_name, monitor.annotate(frame))
+            return cv2.waitKey(1) & 0xFF != ord("q")
+
+        pipeline = FramePipeline(grabber, monitor.process, None, capacity=opt.capacity, policy=DROP_OLDEST)
+        try:
+            pipeline.run(render, stats_interval=opt.stats_interval)
+        finally:
+            monitor.flush()
+            grabber.close()
+            print(pipeline.summary())
+            print(f"{grabber.grabbed} frames grabbed, {grabber.reconnects} reconnects, "
+                  f"{sum(monitor.event_counts.values())} disposal events")
+            cv2.destroyAllWindows()
+    except KeyboardInterrupt:
+        pass
+    except requests.RequestException as e:
+        print(f"Failed to open the RTSP stream: {e}")
+    finally:
+        source.close()
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--skip', type=int, default=0, help='frames skipped (grabbed, not decoded) between processed frames')
+    parser.add_argument('--layout', type=str, default=os.getenv('BIN_LAYOUT') or str(DEFAULT_LAYOUT), help='bin layout file')
+    parser.add_argument('--camera', type=str, default=os.getenv('BIN_CAMERA', 'recorded'), help='camera profile of the layout')
+    parser.add_argument('--capacity', type=int, default=2, help='frames buffered between pipeline stages')
+    parser.add_argument('--stats-interval', type=int, default=10, help='seconds between stage statistics, 0 to disable')
+    parser.add_argument('--view', action='store_true', help='show the annotated stream')
+    parser.add_argument('--no-privacy', action='store_true', help='do not blur outside the bins in the shown stream')
+    parser.add_argument('--print-url', action='store_true', help='only open the stream and keep it alive')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Scopes for the OAuth2
+SCOPES = ["https://www.googleapis.com/auth/sdm.service"]
+
+# Override both to point the session at a local fake SDM server
+SDM_API_URL = os.getenv("SDM_API_URL", "https://smartdevicemanagement.googleapis.com/v1")
+SDM_TOKEN_URI = os.getenv("SDM_TOKEN_URI")
+
+
+def parse_timestamp(value):
+    """Parse an RFC 3339 timestamp from the SDM API into an aware datetime."""
+    value = value.replace("Z", "+00:00")
+    if "." in value:  # trim nanoseconds to microseconds for fromisoformat
+        head, rest = value.split(".", 1)
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:min(digits, 6)].ljust(6, '0')}{rest[digits:]}"
+    return datetime.fromisoformat(value)
+
+
+class StreamLease:
+    """A live stream opened through the SDM API and what is needed to extend or stop it."""
+
+    def __init__(self, kind, results):
+        self.kind = kind  # 'WebRtc' or 'Rtsp'
+        self.results = results
+        self.update(results)
+
+    def update(self, results):
+        self.results.update(results)
+        self.expires_at = parse_timestamp(self.results["expiresAt"])
+        self.media_session_id = self.results.get("mediaSessionId")
+        self.extension_token = self.results.get("streamExtensionToken")
+
+    @property
+    def params(self):
+        """Parameters identifying the stream for the Extend and Stop commands."""
+        if self.kind == "WebRtc":
+            return {"mediaSessionId": self.media_session_id}
+        return {"streamExtensionToken": self.extension_token}
+
+    def seconds_left(self):
+        return (self.expires_at - datetime.now(timezone.utc)).total_seconds()
+
+
+class SdmSession:
+    """Long-lived Smart Device Management API client.
+
+    OAuth tokens are cached in `token_file` and refreshed before they expire, so
+    the browser flow only runs when there is no usable refresh token. Device
+    lists are cached in `device_cache`, and every request goes through one
+    pooled requests.Session with retries.
+    """
+
+    def __init__(self, project_id, client_secrets="credentials.json", token_file="token.json",
+                 device_cache="device_cache.json", api_url=SDM_API_URL, token_uri=SDM_TOKEN_URI, refresh_margin=300,
+                 pool_size=10):
+        self.project_id = project_id
+        self.client_secrets = client_secrets
+        self.token_file = token_file
+        self.device_cache = device_cache
+        self.api_url = api_url.rstrip("/")
+        self.token_uri = token_uri
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._creds = None
+        self._devices = None
+        self._lock = threading.Lock()
+
+        self.http = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+
+    # Credentials
+    def _save_credentials(self):
+        with open(self.token_file, "w") as f:
+            f.write(self._creds.to_json())
+
+    def _load_credentials(self):
+        if os.path.exists(self.token_file):
+            try:
+                with open(self.token_file) as f:
+                    info = json.load(f)
+                creds = Credentials.from_authorized_user_info(info, SCOPES)
+                if self.token_uri:  # from_authorized_user_info always uses Google's token endpoint
+                    creds = creds.with_token_uri(self.token_uri)
+                return creds
+            except ValueError as e:
+                print(f"Ignoring cached token {self.token_file}: {e}")
+        return None
+
+    def credentials(self, force_refresh=False):
+        """Return valid credentials, refreshing them when they expire within refresh_margin."""
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+            creds = self._creds
+            expiring = creds is not None and (
+                not creds.token or creds.expiry is None
+                or creds.expiry - datetime.utcnow() < self.refresh_margin)  # google-auth expiry is naive UTC
+            if creds is not None and creds.refresh_token and (expiring or force_refresh):
+                try:
+                    creds.refresh(Request(self.http))
+                    self._save_credentials()
+                except Exception as e:
+                    print(f"Token refresh failed, starting a new authorization: {e}")
+                    creds = None
+            if creds is None or not creds.token:
+                flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets, SCOPES)
+                self._creds = flow.run_local_server(port=8080)
+                self._save_credentials()
+            return self._creds
+
+    # Requests
+    def request(self, method, path, **kwargs):
+        """Authorized request to the SDM API, retried once with a fresh token on 401."""
+        url = path if path.startswith("http") else f"{self.api_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", 30)
+        extra_headers = kwargs.pop("headers", None) or {}
+        for attempt in range(2):
+            token = self.credentials(force_refresh=attempt > 0).token
+            headers = {**extra_headers, "Authorization": f"Bearer {token}"}
+            response = self.http.request(method, url, headers=headers, **kwargs)
+            if response.status_code != 401:
+                break
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def execute_command(self, device_id, command, params=None):
+        """Run a device command and return its `results`, raising requests.HTTPError on failure."""
+        response = self.request("POST", f"{device_id}:executeCommand", json={"command": command, "params": params or {}})
+        response.raise_for_status()
+        return response.json().get("results", {})
+
+    # Devices
+    def devices(self, refresh=False):
+        """Devices of the project, cached in memory and in device_cache."""
+        if self._devices is None and not refresh and os.path.exists(self.device_cache):
+            with open(self.device_cache) as f:
+                self._devices = json.load(f).get(self.project_id)
+        if self._devices is None or refresh:
+            response = self.get(f"enterprises/{self.project_id}/devices")
+            response.raise_for_status()
+            self._devices = response.json().get("devices", [])
+            cache = {}
+            if os.path.exists(self.device_cache):
+                with open(self.device_cache) as f:
+                    cache = json.load(f)
+            cache[self.project_id] = self._devices
+            with open(self.device_cache, "w") as f:
+                json.dump(cache, f, indent=2)
+        return self._devices
+
+    def camera_device_id(self, refresh=False):
+        """Name of the first camera device, or None."""
+        for device in self.devices(refresh):
+            if "sdm.devices.types.CAMERA" in device.get("type", ""):
+                return device["name"]
+        if not refresh:  # the cache may predate the camera
+            return self.camera_device_id(refresh=True)
+        return None
+
+    # Streams
+    def generate_webrtc_stream(self, device_id, offer_sdp):
+        results = self.execute_command(device_id, "sdm.devices.commands.CameraLiveStream.GenerateWebRtcStream",
+                                       {"offerSdp": offer_sdp})
+        return StreamLease("WebRtc", results)
+
+    def generate_rtsp_stream(self, device_id):
+        results = self.execute_command(device_id, "sdm.devices.commands.CameraLiveStream.GenerateRtspStream")
+        return StreamLease("Rtsp", results)
+
+    def extend_stream(self, device_id, lease):
+        results = self.execute_command(device_id, f"sdm.devices.commands.CameraLiveStream.Extend{lease.kind}Stream",
+                                       lease.params)
+        lease.update(results)
+        return lease
+
+    def stop_stream(self, device_id, lease):
+        self.execute_command(device_id, f"sdm.devices.commands.CameraLiveStream.Stop{lease.kind}Stream", lease.params)
+
+
+class StreamKeeper:
+    """Extend a live stream from a background thread `margin` seconds before it expires."""
+
+    def __init__(self, session, device_id, lease, margin=60, retry_delay=5):
+        self.session = session
+        self.device_id = device_id
+        self.lease = lease
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self.extensions = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stream-keeper", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(max(self.lease.seconds_left() - self.margin, 0)):
+            try:
+                self.session.extend_stream(self.device_id, self.lease)
+                self.extensions += 1
+                print(f"Extended {self.lease.kind} stream until {self.lease.expires_at.isoformat()}")
+            except Exception as e:  # keep the stream alive through malformed responses too
+                if self.lease.seconds_left() <= 0:
+                    print(f"Stream expired, extension failed: {e}")
+                    return
+                print(f"Stream extension failed, retrying in {self.retry_delay}s: {type(e).__name__}: {e}")
+                self._stop.wait(self.retry_delay)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, stop_stream=True):
+        """Stop extending and, by default, end the stream on the camera."""
+        self._stop.set()
+        self._thread.join()
+        if stop_stream:
+            try:
+                self.session.stop_stream(self.device_id, self.lease)
+            except requests.RequestException as e:
+                print(f"Failed to stop {self.lease.kind} stream: {e}")
@@ -1,62 +1,84 @@
+import argparse
 import cv2
 import os
+import sys
+from pathlib import Path
 
-# Function to detect motion in a specified region of interest (ROI)
-def detect_motion(roi, first_frame, threshold=50):
+# Share the background model and bin layout with the livestream code
+LIVESTREAM = Path(__file__).resolve().parents[1] / 'src_livestream'
+if str(LIVESTREAM) not in sys.path:
+    sys.path.append(str(LIVESTREAM))
+
+from background_model import BackgroundModel
+from bin_layout import load_layout
+from clip_decoder import ClipDecoder
+
+# Function to detect motion in a specified region of interest (ROI) against its background model
+def detect_motion(roi, background, blur=21):
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    gray = cv2.GaussianBlur(gray, (21, 21), 0)
+    gray = cv2.GaussianBlur(gray, (blur, blur), 0)
     
     # Ensure the sizes match
-    if gray.shape != first_frame.shape:
-        gray = cv2.resize(gray, (first_frame.shape[1], first_frame.shape[0]))
-    
-    # Compute the absolute difference between the current frame and the background
-    delta = cv2.absdiff(first_frame, gray)
+    if gray.shape != background.shape:
+        gray = cv2.resize(gray, (background.shape[1], background.shape[0]))
     
-    # Threshold the delta image to get the motion areas
-    thresh = cv2.threshold(delta, threshold, 255, cv2.THRESH_BINARY)[1]
+    # Classify the motion areas against the running average and update it in place
+    thresh = background.apply(gray)
     thresh = cv2.dilate(thresh, None, iterations=2)
     contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     return contours
 
-# Open video capture
-video_path = './src/video/bin_detection_8.mp4'
-cap = cv2.VideoCapture(video_path)
+parser = argparse.ArgumentParser()
+parser.add_argument('--video', type=str, default='./src/video/bin_detection_8.mp4', help='recorded clip')
+parser.add_argument('--stride', type=int, default=1, help='process every Nth frame, the others are grabbed but not decoded')
+parser.add_argument('--keyframes', action='store_true', help='process key frames only')
+parser.add_argument('--scale', type=float, default=1.0, help='downscale the bin region before motion detection')
+parser.add_argument('--hw-accel', action='store_true', help='use hardware video decoding when available')
+parser.add_argument('--no-view', action='store_true', help='run without a window, e.g. for batch reprocessing')
+opt = parser.parse_args()
+
+# Load the bounding boxes and labels of each bin from the layout of the recorded clips
+profile = load_layout()['recorded']
+bin_labels = profile.bin_labels
+
+# Decode only the union of the bins, optionally downscaled and skipping frames
+video_path = opt.video
+try:
+    decoder = ClipDecoder(video_path, opt.stride, opt.keyframes, opt.scale, profile.union, opt.hw_accel)
+except (OSError, ValueError) as e:
+    print(os.path.abspath(video_path))
+    print(f"Failed to read video: {e}")
+    exit()
+frames = iter(decoder)
 
 # Read the first frame as the background for motion detection
-ret, frame = cap.read()
-if not ret:
+first = next(frames, None)
+if first is None:
     print(os.path.abspath(video_path))
     print("Failed to read video")
-    cap.release()
+    decoder.close()
     exit()
+frame = first[2]
+profile.validate(decoder.source_shape)
 
-# Define bounding boxes for each bin
-bounding_boxes = [
-    (470, 0, 324, 450),  # Landfill bin
-    (820, 0, 350, 450),  # Recyclable bin
-    (1188, 0, 317, 450)  # Organic bin
-]
+# Bounding boxes in the coordinates of the decoded region, and a blur scaled with it
+bounding_boxes = [decoder.map_box(box) for box in profile.bounding_boxes]
+blur = max(int(21 * opt.scale) | 1, 3)
 
-# Preprocess the first frame for each bounding box
-first_frames = []
+# Seed a background model for each bounding box with the first frame
+backgrounds = []
 for (x, y, w, h) in bounding_boxes:
     roi = frame[y:y+h, x:x+w]
-    first_frame = cv2.GaussianBlur(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (21, 21), 0)
-    first_frames.append(first_frame)
-
-# Define labels for the bins
-bin_labels = ['Landfill', 'Recyclable', 'Organics']
+    first_frame = cv2.GaussianBlur(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (blur, blur), 0)
+    background = BackgroundModel(first_frame.shape)
+    background.initialize(first_frame)
+    backgrounds.append(background)
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-    
+for _, _, frame in frames:
     detected_bin = None
     for i, (x, y, w, h) in enumerate(bounding_boxes):
         roi = frame[y:y+h, x:x+w]
-        contours = detect_motion(roi, first_frames[i])
+        contours = detect_motion(roi, backgrounds[i], blur)
         
         if len(contours) > 0:
             detected_bin = bin_labels[i]
@@ -65,6 +87,9 @@ while cap.isOpened():
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
             break
     
+    if opt.no_view:
+        continue
+
     # Display the frame
     cv2.imshow('Bin Detection', frame)
     
@@ -73,5 +98,7 @@ while cap.isOpened():
         break
 
 # Release video capture and close all windows
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+print(f"Decoded {decoder.decoded} of {decoder.frames} frames")
+decoder.close()
+if not opt.no_view:
+    cv2.destroyAllWindows()
\ No newline at end of file
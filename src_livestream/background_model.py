@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+
+class BackgroundModel:
+    """Exponentially-weighted running mean and variance of a blurred grayscale ROI.
+
+    A pixel is foreground when it differs from the running mean by more than
+    `threshold` grey levels and by more than `sigma` standard deviations.
+    Background pixels are blended into the model at `alpha` per frame, so slow
+    lighting drift is absorbed instead of triggering motion. Foreground pixels
+    are blended at the much smaller `foreground_alpha`, which lets an item that
+    stays in view become background after a while.
+
+    Every frame is classified with two uint8 passes, against a rounded copy of
+    the mean and a per-pixel limit max(threshold, sigma * std). The float32
+    mean and variance, and from them the rounded mean and the limit, are
+    updated every `update_interval` frames with the equivalent alphas, so their
+    cost is spread over that many frames. With `mask`, pixels outside it are
+    never foreground and never update the model. All buffers are preallocated.
+    """
+
+    def __init__(self, shape, alpha=0.02, foreground_alpha=0.002, threshold=50, sigma=2.5,
+                 initial_variance=25.0, min_variance=4.0, update_interval=4, mask=None):
+        self.shape = tuple(shape[:2])
+        self.threshold = threshold
+        self.sigma = sigma
+        self.initial_variance = initial_variance
+        self.min_variance = min_variance
+        self.update_interval = max(int(update_interval), 1)
+        # Alphas of one update standing in for `update_interval` per-frame updates
+        self.alpha = 1 - (1 - alpha) ** self.update_interval
+        self.foreground_alpha = 1 - (1 - foreground_alpha) ** self.update_interval
+        self.mask = mask
+
+        self.mean = np.zeros(self.shape, np.float32)
+        self.var = np.full(self.shape, initial_variance, np.float32)
+        self.mean_u8 = np.zeros(self.shape, np.uint8)
+        self.limit = np.empty(self.shape, np.uint8)
+        self._sq = np.empty(self.shape, np.float32)
+        self._std = np.empty(self.shape, np.float32)
+        self._diff = np.empty(self.shape, np.uint8)
+        self._foreground = np.empty(self.shape, np.uint8)
+        self._update = np.empty(self.shape, np.uint8)
+        self.frames = 0
+        self.initialized = False
+
+    def _refresh(self, region=Ellipsis):
+        """Recompute the rounded mean and the classification limit from the float model."""
+        np.maximum(self.var[region], self.min_variance, out=self.var[region])
+        np.sqrt(self.var[region], out=self._std[region])
+        self._std[region] *= self.sigma
+        np.maximum(self._std[region], self.threshold, out=self._std[region])
+        np.minimum(self._std[region], 255, out=self._std[region])
+        self.limit[region] = self._std[region]
+        np.rint(self.mean[region], out=self._sq[region])
+        self.mean_u8[region] = self._sq[region]
+
+    def initialize(self, gray, region=None):
+        """Reset the model to the blurred gray image, or only the `region` slices of it."""
+        if region is None:
+            self.mean[:] = gray
+            self.var.fill(self.initial_variance)
+            self._refresh()
+            self.initialized = True
+        else:
+            self.mean[region] = gray[region]
+            self.var[region] = self.initial_variance
+            self._refresh(region)
+
+    def apply(self, gray, out=None):
+        """Classify the blurred gray image against the model, updating the model every `update_interval` frames.
+
+        Returns a uint8 mask (0 or 255) of foreground pixels, written to `out` if given.
+        """
+        if out is None:
+            out = self._foreground
+        if not self.initialized:
+            self.initialize(gray)
+            out.fill(0)
+            return out
+
+        # Foreground: above both the absolute threshold and sigma standard deviations
+        cv2.absdiff(gray, self.mean_u8, dst=self._diff)
+        cv2.compare(self._diff, self.limit, cv2.CMP_GT, dst=out)
+        if self.mask is not None:
+            cv2.bitwise_and(out, self.mask, dst=out)
+
+        self.frames += 1
+        if self.frames % self.update_interval == 0:
+            self._update_model(gray, out)
+        return out
+
+    def _update_model(self, gray, foreground):
+        """Selective running average of mean and variance, then refresh the classification buffers."""
+        cv2.subtract(gray, self.mean, dst=self._sq, dtype=cv2.CV_32F)
+        cv2.multiply(self._sq, self._sq, dst=self._sq)
+        cv2.bitwise_not(foreground, dst=self._update)
+        if self.mask is not None:
+            cv2.bitwise_and(self._update, self.mask, dst=self._update)
+        cv2.accumulateWeighted(gray, self.mean, self.alpha, mask=self._update)
+        cv2.accumulateWeighted(self._sq, self.var, self.alpha, mask=self._update)
+        if self.foreground_alpha > 0:
+            cv2.accumulateWeighted(gray, self.mean, self.foreground_alpha, mask=foreground)
+            cv2.accumulateWeighted(self._sq, self.var, self.foreground_alpha, mask=foreground)
+        self._refresh()
@@ -0,0 +1,62 @@
+import heapq
+import math
+
+import cv2
+import numpy as np
+
+
+class BestFrameSelector:
+    """Keep the top-k frames of a motion episode for classification.
+
+    Every frame of an episode is scored from three cheap cues on the bin ROI:
+    sharpness (variance of the Laplacian of the grayscale crop), foreground
+    area from the motion mask, and how close the foreground centroid is to the
+    bin opening. Only frames that enter the current top-k are copied, so an
+    episode never holds more than k crops.
+    """
+
+    def __init__(self, k=3, opening=(0.5, 0.5), weights=(0.5, 0.3, 0.2), sharpness_scale=100.0,
+                 area_target=0.1):
+        self.k = k
+        self.opening = opening  # bin opening as a fraction of the ROI width and height
+        self.weights = weights  # sharpness, area, proximity to the opening
+        self.sharpness_scale = sharpness_scale
+        self.area_target = area_target
+        self._laplacian = {}  # preallocated Laplacian buffers by ROI shape
+
+    def score(self, gray, mask):
+        """Score one frame of a bin from its grayscale ROI and motion mask, None without foreground."""
+        moments = cv2.moments(mask, binaryImage=True)
+        area = moments['m00']
+        if area == 0:
+            return None
+
+        h, w = gray.shape[:2]
+        lap = self._laplacian.get((h, w))
+        if lap is None:
+            lap = self._laplacian[(h, w)] = np.empty((h, w), np.int16)
+        cv2.Laplacian(gray, cv2.CV_16S, dst=lap)
+        sharpness = float(cv2.meanStdDev(lap)[1][0, 0]) ** 2
+
+        cx, cy = moments['m10'] / area, moments['m01'] / area
+        distance = math.hypot(cx / w - self.opening[0], cy / h - self.opening[1]) / math.sqrt(2)
+
+        ws, wa, wp = self.weights
+        return (ws * sharpness / (sharpness + self.sharpness_scale)
+                + wa * min(area / (w * h) / self.area_target, 1.0)
+                + wp * (1.0 - distance))
+
+    def offer(self, candidates, quality, frame_index, crop):
+        """Add a scored frame to the candidate heap of an episode if it is in the top-k.
+
+        `crop` is a callable returning a copy of the ROI and is only called when kept.
+        """
+        if len(candidates) < self.k:
+            heapq.heappush(candidates, (quality, frame_index, crop()))
+        elif quality > candidates[0][0]:
+            heapq.heapreplace(candidates, (quality, frame_index, crop()))
+
+    @staticmethod
+    def select(candidates):
+        """Return the kept (quality, frame_index, crop) tuples, best first."""
+        return sorted(candidates, key=lambda c: c[0], reverse=True)
@@ -3,11 +3,16 @@ import numpy as np
 import os
 from dotenv import load_dotenv
 import time
+from background_model import BackgroundModel
+from bin_layout import LayoutWatcher, load_layout
+from bin_monitor import BinMonitor
+from snapshot_writer import SnapshotWriter
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Function to detect motion in a specified region of interest (ROI)
+# first_frame is either a blurred grayscale reference or a BackgroundModel for the ROI
 def detect_motion(roi, first_frame, threshold=50):
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (21, 21), 0)
@@ -16,11 +21,15 @@ def detect_motion(roi, first_frame, threshold=50):
     if gray.shape != first_frame.shape:
         gray = cv2.resize(gray, (first_frame.shape[1], first_frame.shape[0]))
     
-    # Compute the absolute difference between the current frame and the background
-    delta = cv2.absdiff(first_frame, gray)
-    
-    # Threshold the delta image to get the motion areas
-    thresh = cv2.threshold(delta, threshold, 255, cv2.THRESH_BINARY)[1]
+    if isinstance(first_frame, BackgroundModel):
+        # Classify against the running average and update it in place
+        thresh = first_frame.apply(gray)
+    else:
+        # Compute the absolute difference between the current frame and the background
+        delta = cv2.absdiff(first_frame, gray)
+
+        # Threshold the delta image to get the motion areas
+        thresh = cv2.threshold(delta, threshold, 255, cv2.THRESH_BINARY)[1]
     thresh = cv2.dilate(thresh, None, iterations=2)
     contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -48,10 +57,69 @@ bounding_boxes = [box for box in bounding_boxes if box is not None]
 # Define labels for the bins
 bin_labels = ['Landfill', 'Recyclable', 'Organics']
 
-# Maintain the first frames, previous contour counts, and last update times across function calls
-first_frames = None
-previous_contour_counts = [0] * len(bounding_boxes)
-last_update_times = [0] * len(bounding_boxes)
+# A bin layout file overrides the boxes above (BIN_LAYOUT=path, BIN_CAMERA=profile name)
+BIN_LAYOUT = os.getenv('BIN_LAYOUT')
+BIN_CAMERA = os.getenv('BIN_CAMERA', 'livestream')
+camera_profile = None
+if BIN_LAYOUT:
+    camera_profile = load_layout(BIN_LAYOUT)[BIN_CAMERA]
+    bounding_boxes, bin_labels = camera_profile.bounding_boxes, camera_profile.bin_labels
+
+# Snapshots and status messages are written off the capture thread (set SAVE_SNAPSHOTS=0 to disable)
+SAVE_SNAPSHOTS = os.getenv('SAVE_SNAPSHOTS', '1') != '0'
+
+# Waste classification of the best frames of each disposal event (set YOLO_WEIGHTS to a YOLOv5 model to enable)
+YOLO_WEIGHTS = os.getenv('YOLO_WEIGHTS')
+BEST_FRAMES = int(os.getenv('BEST_FRAMES', '3'))  # frames per event sent to the detector
+
+# Blur the surroundings of the bins in the displayed stream (set PRIVACY_BLUR=0 to disable)
+PRIVACY_BLUR = os.getenv('PRIVACY_BLUR', '1') != '0'
+
+# Save clips of each disposal episode with a few seconds of pre-roll (set RECORD_CLIPS=1 to enable)
+RECORD_CLIPS = os.getenv('RECORD_CLIPS', '0') != '0'
+CLIP_PREROLL = float(os.getenv('CLIP_PREROLL', '2.0'))
+
+# The single-camera monitor used by process_frame and its helpers, created on the first frame (see create_monitor)
+snapshot_writer = None
+clip_recorder = None
+classifier_worker = None
+monitor = None
+layout_watcher = None
+
+def create_snapshot_writer():
+    return SnapshotWriter(enabled=SAVE_SNAPSHOTS)
+
+def load_classifier(weights=None, workers=1):
+    """Load the YOLOv5 model once and start the background classifier workers."""
+    from waste_classifier import ClassifierWorker, WasteClassifier  # scoped so torch is only imported when enabled
+    classifier = WasteClassifier(weights or YOLO_WEIGHTS, device=os.getenv('YOLO_DEVICE', ''),
+                                 imgsz=int(os.getenv('YOLO_IMGSZ', '320')))
+    return ClassifierWorker(classifier, workers=workers)
+
+def create_monitor():
+    """Create the monitor for the configured bins, with its snapshot writer and optional clip recorder."""
+    global snapshot_writer, clip_recorder, monitor, layout_watcher
+    snapshot_writer = create_snapshot_writer()
+    if RECORD_CLIPS:
+        from clip_recorder import ClipRecorder
+        clip_recorder = ClipRecorder(preroll=CLIP_PREROLL)
+    if camera_profile is not None:
+        monitor = BinMonitor.from_profile(camera_profile, snapshot_writer=snapshot_writer, best_frames=BEST_FRAMES,
+                                          privacy=PRIVACY_BLUR, recorder=clip_recorder)
+        layout_watcher = LayoutWatcher(BIN_LAYOUT)
+    else:
+        monitor = BinMonitor('', bounding_boxes, bin_labels, snapshot_writer=snapshot_writer, best_frames=BEST_FRAMES,
+                             privacy=PRIVACY_BLUR, recorder=clip_recorder)
+    return monitor
+
+def close():
+    """Stop the classifier workers and write out pending clips and snapshots."""
+    if classifier_worker is not None:
+        classifier_worker.close()
+    if clip_recorder is not None:
+        clip_recorder.close()
+    if snapshot_writer is not None:
+        snapshot_writer.close()
 
 def draw_bounding_boxes(frame):
     """Draw bounding boxes for all bins."""
@@ -60,57 +128,25 @@ def draw_bounding_boxes(frame):
     return frame
 
 def process_frame(frame):
-    global first_frames
-    global previous_contour_counts
-    global last_update_times
+    global classifier_worker
     
     # Uncomment the following line to always draw bounding boxes
     # frame = draw_bounding_boxes(frame)
 
-    detected_bin = None
-    current_time = time.time()
-    
-    if first_frames is None:
-        # Preprocess the first frame for each bounding box
-        first_frames = []
-        i = 0
-        for (x, y, w, h) in bounding_boxes:
-            roi = frame[y:y+h, x:x+w]
-            first_frame = cv2.GaussianBlur(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (21, 21), 0)
-            first_frames.append(first_frame)
-
-            # Save the first frame for inspection in the src_livestream directory
-            cv2.imwrite(os.path.join('src_livestream', 'images', f'first_frame_{bin_labels[i]}.png'), roi)
-            print(f"Saved first frame for {bin_labels[i]} to src_livestream/images/first_frame_{bin_labels[i]}.png")
-            i += 1
-
-        return frame  # Return the original frame on the first pass
-
-    for i, (x, y, w, h) in enumerate(bounding_boxes):
-        roi = frame[y:y+h, x:x+w]
-        contours = detect_motion(roi, first_frames[i])
-
-        # Print the contour count only if it changes
-        if len(contours) != previous_contour_counts[i]:
-            print(f"Contours detected in {bin_labels[i]}: {len(contours)}")
-            previous_contour_counts[i] = len(contours)
-
-        if len(contours) > 0:
-            detected_bin = bin_labels[i]
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(frame, f'Waste detected in: {detected_bin}', (10, 400),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-            
-            # Update the first frame for the detected bin if at least one second has passed
-            if current_time - last_update_times[i] >= 1:
-                first_frame = cv2.GaussianBlur(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), (21, 21), 0)
-                first_frames[i] = first_frame
-                last_update_times[i] = current_time
-
-                # Optionally, save the updated first frame for inspection
-                cv2.imwrite(os.path.join('src_livestream', 'images', f'first_frame_{bin_labels[i]}.png'), roi)
-                print(f"Updated first frame for {bin_labels[i]} to src_livestream/images/first_frame_{bin_labels[i]}.png")
-            
-            break
-
-    return frame
\ No newline at end of file
+    if monitor is None:
+        create_monitor()
+
+    if YOLO_WEIGHTS and classifier_worker is None:
+        classifier_worker = monitor.classifier = load_classifier()
+
+    # Pick up edits to the layout file without restarting the capture loop
+    if layout_watcher is not None:
+        layout = layout_watcher.poll(time.monotonic())
+        if layout is not None and BIN_CAMERA in layout.cameras:
+            monitor.apply_profile(layout[BIN_CAMERA])
+
+    return monitor.process(frame)
+
+def annotate_frame(frame):
+    """Blur outside the bins and draw the active ones on a frame about to be shown."""
+    return monitor.annotate(frame) if monitor is not None else frame
@@ -0,0 +1,169 @@
+import json
+import os
+from pathlib import Path
+
+import yaml
+
+# Layout shipped with the repo, used when no other file is given
+DEFAULT_LAYOUT = Path(__file__).resolve().parent / 'config' / 'bin_layout.yaml'
+
+# Keyword arguments accepted by MotionEngine and BinEventTracker from a profile
+MOTION_KEYS = ('threshold', 'blur_size', 'dilate_iterations', 'min_area', 'alpha', 'foreground_alpha', 'sigma',
+               'update_interval')
+EVENT_KEYS = ('enter_score', 'exit_score', 'min_duration', 'settle_time', 'max_duration')
+PRIVACY_KEYS = ('mode', 'strength', 'downscale')  # PrivacyFilter settings
+
+
+class BinSpec:
+    """One bin of a camera: its label and box."""
+
+    def __init__(self, label, box):
+        if len(box) != 4 or any(not isinstance(v, int) for v in box):
+            raise ValueError(f"Bin {label!r}: box must be four integers x, y, w, h, got {box!r}")
+        x, y, w, h = box
+        if x < 0 or y < 0 or w <= 0 or h <= 0:
+            raise ValueError(f"Bin {label!r}: invalid box {box!r}")
+        self.label = label
+        self.box = (x, y, w, h)
+
+    def __repr__(self):
+        return f"BinSpec({self.label!r}, {self.box})"
+
+
+class CameraProfile:
+    """Bins and motion settings of one camera, validated at load time."""
+
+    def __init__(self, name, bins, source=None, resolution=None, motion=None, events=None, privacy=None):
+        if not bins:
+            raise ValueError(f"Camera {name!r}: no bins defined")
+        self.name = name
+        self.source = source
+        self.resolution = tuple(resolution) if resolution else None  # (width, height)
+        self.bins = [BinSpec(b['label'], list(b['box'])) for b in bins]
+        self.motion = dict(motion or {})
+        self.events = dict(events or {})
+        self.privacy = dict(privacy or {})
+        for key in self.motion:
+            if key not in MOTION_KEYS:
+                raise ValueError(f"Camera {name!r}: unknown motion setting {key!r}")
+        for key in self.events:
+            if key not in EVENT_KEYS:
+                raise ValueError(f"Camera {name!r}: unknown event setting {key!r}")
+        for key in self.privacy:
+            if key not in PRIVACY_KEYS:
+                raise ValueError(f"Camera {name!r}: unknown privacy setting {key!r}")
+
+        blur_size = self.motion.get('blur_size', 21)
+        if blur_size <= 0 or blur_size % 2 == 0:
+            raise ValueError(f"Camera {name!r}: blur_size must be a positive odd number, got {blur_size}")
+
+        # Union of the bins, the region decoded and processed for this camera
+        x0 = min(b.box[0] for b in self.bins)
+        y0 = min(b.box[1] for b in self.bins)
+        x1 = max(b.box[0] + b.box[2] for b in self.bins)
+        y1 = max(b.box[1] + b.box[3] for b in self.bins)
+        self.union = (slice(y0, y1), slice(x0, x1))
+        if self.resolution:
+            self.validate((self.resolution[1], self.resolution[0]))
+
+    @property
+    def bounding_boxes(self):
+        return [b.box for b in self.bins]
+
+    @property
+    def bin_labels(self):
+        return [b.label for b in self.bins]
+
+    def validate(self, frame_shape):
+        """Raise ValueError unless every bin fits in a frame of this shape (height, width, ...)."""
+        h, w = frame_shape[:2]
+        if self.resolution and self.resolution != (w, h):
+            raise ValueError(f"Camera {self.name!r}: expected {self.resolution[0]}x{self.resolution[1]} frames, got {w}x{h}")
+        for b in self.bins:
+            x, y, bw, bh = b.box
+            if x + bw > w or y + bh > h:
+                raise ValueError(f"Camera {self.name!r}: bin {b.label!r} {b.box} exceeds the {w}x{h} frame")
+
+    def engine_kwargs(self):
+        """Keyword arguments for MotionEngine."""
+        return dict(self.motion)
+
+
+class BinLayout:
+    """All camera profiles of a layout file."""
+
+    def __init__(self, cameras, path=None):
+        self.cameras = cameras
+        self.path = path
+
+    def __getitem__(self, name):
+        if name not in self.cameras:
+            raise KeyError(f"Camera {name!r} not in layout {self.path} (available: {', '.join(self.cameras)})")
+        return self.cameras[name]
+
+    def __iter__(self):
+        return iter(self.cameras.values())
+
+    def __len__(self):
+        return len(self.cameras)
+
+
+def load_layout(path=DEFAULT_LAYOUT):
+    """Load and validate a YAML or JSON layout file.
+
+    The file has a `cameras` mapping of profile name to source, resolution,
+    bins (label and box) and optional motion, events and privacy settings; a
+    top-level `defaults` section provides these settings for every camera.
+    """
+    path = Path(path)
+    with open(path, errors='ignore') as f:
+        data = json.load(f) if path.suffix == '.json' else yaml.safe_load(f)
+    if not isinstance(data, dict) or not data.get('cameras'):
+        raise ValueError(f"Layout {path} has no cameras")
+
+    defaults = data.get('defaults') or {}
+    cameras = {}
+    for name, spec in data['cameras'].items():
+        cameras[name] = CameraProfile(
+            name,
+            spec.get('bins'),
+            source=spec.get('source'),
+            resolution=spec.get('resolution'),
+            motion={**defaults.get('motion', {}), **spec.get('motion', {})},
+            events={**defaults.get('events', {}), **spec.get('events', {})},
+            privacy={**defaults.get('privacy', {}), **spec.get('privacy', {})},
+        )
+    return BinLayout(cameras, path)
+
+
+class LayoutWatcher:
+    """Reload a layout file when it changes on disk.
+
+    `poll` only stats the file at most every `interval` seconds, so it can be
+    called from a capture loop. A file that fails to parse or validate is
+    reported and the previous layout is kept.
+    """
+
+    def __init__(self, path=DEFAULT_LAYOUT, interval=2.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.layout = load_layout(self.path)
+        self._mtime = os.stat(self.path).st_mtime
+        self._checked = 0.0
+
+    def poll(self, now):
+        """Return the new BinLayout if the file changed since the last poll, otherwise None."""
+        if now - self._checked < self.interval:
+            return None
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return None
+            self._mtime = mtime
+            self.layout = load_layout(self.path)
+        except (OSError, ValueError, KeyError, TypeError, yaml.YAMLError) as e:
+            print(f"Keeping the previous bin layout, failed to reload {self.path}: {e}")
+            return None
+        print(f"Reloaded bin layout from {self.path}")
+        return self.layout
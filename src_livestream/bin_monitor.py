@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import Counter, deque
+
+import cv2
+
+from best_frame import BestFrameSelector
+from disposal_events import DisposalEventDetector
+from motion_engine import MotionEngine
+from privacy import PrivacyFilter
+
+
+class BinMonitor:
+    """Motion, disposal events and classification for the bins of one camera.
+
+    All per-camera state lives on the instance, so any number of monitors can
+    run in one process. Snapshots and classification go through the shared
+    `snapshot_writer` and `classifier` (a ClassifierWorker) when given.
+    `process` leaves frames untouched; display sinks call `annotate` on the
+    frames they actually show, which blurs outside the bins when `privacy` is
+    set and draws the active bins. A `recorder` (ClipRecorder) gets every frame
+    with the bins active in it and saves clips of the disposal episodes, hiding
+    the surroundings of the bins in the frames it writes when `privacy` is set.
+    """
+
+    def __init__(self, name, bounding_boxes, bin_labels, snapshot_writer=None, classifier=None, best_frames=3,
+                 engine_kwargs=None, event_kwargs=None, privacy=False, recorder=None, keep_events=100):
+        self.name = name
+        self.bounding_boxes = bounding_boxes
+        self.bin_labels = bin_labels
+        self.snapshot_writer = snapshot_writer
+        self.classifier = classifier
+        self.best_frames = best_frames
+        self.engine_kwargs = engine_kwargs or {}
+        self.event_kwargs = event_kwargs or {}
+        self.privacy = privacy
+        self.recorder = recorder
+
+        self.motion_engine = None
+        self.privacy_filter = None
+        self.event_detector = None
+        self.active_bins = []  # bins active in the latest processed frame
+        self.frame_index = 0
+        self.profile = None
+        self._pending_profile = None
+
+        # Recently finished disposal events, for downstream classification and storage (all if keep_events=None)
+        self.completed_events = deque(maxlen=keep_events)
+        self.event_counts = Counter()  # all events seen, per bin label
+        self._lock = threading.Lock()  # classifier workers report concurrently
+
+    @classmethod
+    def from_profile(cls, profile, **kwargs):
+        """Create a monitor for a CameraProfile of a bin layout."""
+        monitor = cls(profile.name, profile.bounding_boxes, profile.bin_labels, **kwargs)
+        monitor._use_profile(profile)
+        return monitor
+
+    def _use_profile(self, profile):
+        self.profile = profile
+        self.bounding_boxes = profile.bounding_boxes
+        self.bin_labels = profile.bin_labels
+        self.engine_kwargs = profile.engine_kwargs()
+        self.event_kwargs = dict(profile.events)
+
+    def apply_profile(self, profile):
+        """Switch to a new CameraProfile from any thread; it takes effect on the next frame.
+
+        The motion engine and event trackers are rebuilt and re-seeded from that
+        frame, while the capture loop and the classifier keep running.
+        """
+        self._pending_profile = profile
+
+    def _snapshot(self, key, filename, image, force=False):
+        if self.snapshot_writer is not None:
+            prefix = f'{self.name}_' if self.name else ''
+            self.snapshot_writer.save((self.name, key), prefix + filename, image, force=force)
+
+    def _log(self, message):
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.log(f'[{self.name}] {message}' if self.name else message)
+
+    def report_classification(self, event, det):
+        """Classify the event from the most confident of its best frames (runs on a classifier thread).
+
+        `det` is None for a crop the classifier dropped or failed on; an event
+        none of whose crops were classified gets the classification 'unclassified'.
+        """
+        with self._lock:  # only the report completing the event classifies it
+            event.detections.append(det)
+            if len(event.detections) != max(len(event.best_frames), 1):
+                return
+            detections = [d for d in event.detections if d is not None]
+            best = max(detections, key=lambda d: d[:, 4].max() if len(d) else 0.0) if detections else None
+        event.classification = 'unclassified' if best is None else self.classifier.classifier.describe(best)
+        self._log(f"Classified disposal in {event.label}: {event.classification}")
+
+    def handle_event(self, event):
+        """Hand a finished disposal event to storage and classification."""
+        self.completed_events.append(event)
+        self.event_counts[event.label] += 1
+        self._log(f"Disposal in {event.label}: {event.duration:.1f}s, "
+                  f"frames {event.start_frame}-{event.end_frame}, peak {event.peak_frame}")
+        if event.best_frame is not None:
+            self._snapshot(('event', event.bin), f'event_{event.label}_{event.peak_frame}.png', event.best_frame)
+            if self.classifier is not None:
+                for crop in [crop for _, _, crop in event.best_frames] or [event.best_frame]:
+                    self.classifier.submit(event, crop, self.report_classification)
+
+    def _setup(self, frame):
+        if self.profile is not None:
+            self.profile.validate(frame.shape)
+
+        # Build the engine and use the first frame to seed the background model of every bounding box
+        self.motion_engine = MotionEngine(self.bounding_boxes, frame.shape, **self.engine_kwargs)
+        self.motion_engine.set_background(frame)
+        self.event_detector = DisposalEventDetector(self.bounding_boxes, self.bin_labels,
+                                                    selector=BestFrameSelector(k=self.best_frames),
+                                                    **self.event_kwargs)
+        if self.privacy:
+            if self.profile is not None:
+                self.privacy_filter = PrivacyFilter.from_profile(self.profile, frame.shape)
+            else:
+                self.privacy_filter = PrivacyFilter(frame.shape, self.bounding_boxes)
+            if self.recorder is not None:
+                settings = self.profile.privacy if self.profile is not None else {}
+                self.recorder.set_privacy(frame.shape, self.bounding_boxes, **settings)
+
+        for i, (x, y, w, h) in enumerate(self.bounding_boxes):
+            # Queue the first frame for inspection
+            self._snapshot(i, f'first_frame_{self.bin_labels[i]}.png', frame[y:y+h, x:x+w], force=True)
+
+    def annotate(self, frame):
+        """Hide the surroundings of the bins and draw the bins active in the latest processed frame, in place.
+
+        Called by display sinks on the frames they show, so frames the pipeline drops never pay for the blur.
+        """
+        if self.privacy_filter is not None:
+            self.privacy_filter.apply(frame)
+
+        detected_bins = []
+        for i in self.active_bins:
+            x, y, w, h = self.bounding_boxes[i]
+            detected_bins.append(self.bin_labels[i])
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+
+        if detected_bins:
+            cv2.putText(frame, f'Waste detected in: {", ".join(detected_bins)}', (10, 400),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
+
+        return frame
+
+    def process(self, frame, timestamp=None, frame_index=None):
+        """Run one frame through motion detection and the event layer; the frame is not modified.
+
+        Events number frames by `frame_index` when given (e.g. the source index of
+        a subsampled video), otherwise by a count of the processed frames.
+        """
+        self.frame_index = self.frame_index + 1 if frame_index is None else frame_index
+
+        if self._pending_profile is not None:
+            profile, self._pending_profile = self._pending_profile, None
+            try:
+                profile.validate(frame.shape)
+            except ValueError as e:
+                self._log(f"Keeping the current bins: {e}")
+            else:
+                self.flush()
+                self._use_profile(profile)
+                self.motion_engine = None
+
+        if self.motion_engine is None:
+            self._setup(frame)
+            self.active_bins = []
+            return frame
+
+        results = self.motion_engine.process(frame)
+
+        # Crops are taken before anything is drawn on the frame
+        timestamp = time.time() if timestamp is None else timestamp
+        for event in self.event_detector.update(results, self.frame_index, timestamp, frame, self.motion_engine):
+            self.handle_event(event)
+
+        self.active_bins = self.event_detector.active()
+        if self.recorder is not None:
+            self.recorder.update(frame, [self.bin_labels[i] for i in self.active_bins], timestamp)
+
+        return frame
+
+    def flush(self):
+        """Close open episodes, e.g. when the stream ends."""
+        for event in self.event_detector.flush() if self.event_detector is not None else []:
+            self.handle_event(event)
+        if self.recorder is not None:
+            self.recorder.stop()
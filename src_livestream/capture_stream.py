@@ -2,14 +2,17 @@ import cv2
 import numpy as np
 from mss import mss
 import time
-from bin_detection_stream import process_frame  # Import the function to process frames
+import bin_detection_stream
+from bin_detection_stream import annotate_frame, process_frame  # Import the functions to process and show frames
 import screeninfo
+from pipeline import DROP_OLDEST, FramePipeline
+from screen_grabber import SCREEN_REGION, ScreenGrabber
 
 # Close all previous OpenCV windows
 cv2.destroyAllWindows()
 
 # Define the screen region to capture based on your provided coordinates and size
-monitor = {"top": 236, "left": 24, "width": 1439, "height": 807}
+monitor = dict(SCREEN_REGION)
 
 # Initialize mss for screen capture
 sct = mss()
@@ -35,7 +38,14 @@ def capture_and_save_image():
     cv2.waitKey(0)  # Wait until a key is pressed
     cv2.destroyAllWindows()
 
-def capture_stream():
+def capture_stream(capacity=2, policy=DROP_OLDEST, max_fps=0, stats_interval=5, zero_copy=True):
+    """Run grab, motion processing and display as separate pipeline stages.
+
+    capacity and policy control the rings between stages (DROP_OLDEST or DROP_NEWEST),
+    max_fps optionally caps the grab rate, and stage counters are printed every
+    stats_interval seconds (0 to disable). zero_copy passes raw BGRA screenshots
+    through the pipeline instead of converting every frame to BGR.
+    """
     window_name = "Live Stream Capture"
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)  # Allow window resizing
 
@@ -46,28 +56,24 @@ def capture_stream():
     # Set the window size to match the screen's dimensions
     cv2.resizeWindow(window_name, screen_width, screen_height)
 
-    try:
-        while True:
-
-            # Capture the screen
-            screenshot = sct.grab(monitor)
-            img = np.array(screenshot)
+    def render(frame, meta):
+        # Blur, annotate and display the processed frame; frames dropped before this point skip it
+        cv2.imshow(window_name, annotate_frame(frame))
 
-            # Convert to a format OpenCV can use (from BGRA to BGR)
-            frame = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        # Stop the pipeline on 'q' key press
+        return cv2.waitKey(1) & 0xFF != ord("q")
 
-            # Process the captured frame
-            processed_frame = process_frame(frame)
+    frame_shape = None if zero_copy else (monitor["height"], monitor["width"], 3)
+    pipeline = FramePipeline(ScreenGrabber(monitor, zero_copy), process_frame, frame_shape,
+                             capacity=capacity, policy=policy, max_fps=max_fps)
 
-            # Display the processed frame
-            cv2.imshow(window_name, processed_frame)
-
-            # Break loop on 'q' key press
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+    try:
+        pipeline.run(render, stats_interval=stats_interval)
 
     finally:
-        # Release resources and close all windows
+        # Release resources, flush pending snapshots and close all windows
+        print(pipeline.summary())
+        bin_detection_stream.close()
         cv2.destroyAllWindows()
 
 
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+
+class ClipDecoder:
+    """Read only what the bin pipeline needs from a recorded clip.
+
+    Frames between the ones returned are grab()bed without retrieve(), so they
+    are never converted to BGR: `stride` keeps every Nth frame and
+    `keyframes` only key frames (FFmpeg backend with OpenCV >= 4.7, otherwise
+    `stride` is used). Each kept frame is cropped to `roi` (a (rows, cols)
+    slice pair such as CameraProfile.union) and then resized by `scale`, into a
+    buffer that is reused for every frame, so copy frames that must outlive the
+    next iteration. `hw_accel` asks FFmpeg for hardware decoding where available.
+
+    Iterating yields (frame index, timestamp in seconds, frame).
+    """
+
+    def __init__(self, path, stride=1, keyframes=False, scale=1.0, roi=None, hw_accel=False):
+        self.path = str(path)
+        self.stride = max(int(stride), 1)
+        self.scale = scale
+        self.roi = roi
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY] if hw_accel else []
+        self.cap = cv2.VideoCapture(self.path, cv2.CAP_FFMPEG, params)
+        if not self.cap.isOpened():
+            raise OSError(f"Failed to open {self.path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.source_shape = (height, width)
+
+        self.keyframe_prop = getattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME', None) if keyframes else None
+        if keyframes and self.keyframe_prop is None:
+            print(f"Key frame detection needs OpenCV >= 4.7, decoding every {self.stride} frames instead")
+
+        if roi is not None:
+            rows, cols = roi
+            if rows.stop > height or cols.stop > width:
+                raise ValueError(f"ROI {cols.start}:{cols.stop}, {rows.start}:{rows.stop} exceeds the {width}x{height} frame")
+            height, width = rows.stop - rows.start, cols.stop - cols.start
+        self.shape = (round(height * scale), round(width * scale), 3)
+        self.frames = 0  # frames read from the stream
+        self.decoded = 0  # frames retrieved and returned
+        self._full = None
+        self._out = np.empty(self.shape, np.uint8) if scale != 1.0 else None
+
+    def map_box(self, box):
+        """Map a full-frame (x, y, w, h) box into the coordinates of the decoded frames."""
+        x, y, w, h = box
+        if self.roi is not None:
+            x, y = x - self.roi[1].start, y - self.roi[0].start
+        s = self.scale
+        return round(x * s), round(y * s), round(w * s), round(h * s)
+
+    def _wanted(self):
+        if self.keyframe_prop is not None:
+            return bool(self.cap.get(self.keyframe_prop))
+        return (self.frames - 1) % self.stride == 0
+
+    def __iter__(self):
+        while True:
+            if not self.cap.grab():
+                break
+            self.frames += 1
+            if not self._wanted():
+                continue
+            index = self.frames - 1
+            timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1E3
+            ret, self._full = self.cap.retrieve(self._full)
+            if not ret:
+                break
+            frame = self._full if self.roi is None else self._full[self.roi]
+            if self._out is not None:
+                frame = cv2.resize(frame, (self.shape[1], self.shape[0]), dst=self._out, interpolation=cv2.INTER_AREA)
+            self.decoded += 1
+            yield index, timestamp, frame
+
+    def close(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from privacy import PrivacyFilter
+
+
+class ClipRecorder:
+    """Record short clips around disposal episodes instead of continuous footage.
+
+    `update` only copies each frame onto a bounded queue (subsampled to at most
+    `fps` frames per second when set); a background thread shrinks it by
+    `scale`, JPEG encodes it when `jpeg_quality` is set and keeps the last
+    `preroll` seconds of frames, by timestamp, in a ring buffer. When a bin
+    becomes active the pre-roll is flushed into a new clip, and recording
+    continues until no bin has been active for `postroll` seconds. Clips are
+    written at the measured rate of the recorded frames, so they play back in
+    real time whatever the source rate. When the thread falls behind the oldest
+    queued frame is dropped, so the capture loop never waits. After
+    `set_privacy`, the surroundings of the bins are hidden on that thread in
+    the frames actually written, not in every buffered one.
+    """
+
+    def __init__(self, directory=os.path.join('src_livestream', 'clips'), name='', preroll=2.0, postroll=1.0,
+                 fps=None, scale=0.5, jpeg_quality=None, max_queue=64, fourcc='mp4v'):
+        self.directory = directory
+        self.name = name
+        self.preroll = preroll
+        self.postroll = postroll
+        self.fps = fps  # cap on the recorded frame rate, None to keep every frame
+        self.scale = scale
+        self.jpeg_quality = jpeg_quality
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.clips = 0
+        self.dropped = 0
+        self.recording = None  # path of the clip being recorded
+        self._privacy = None  # (frame_shape, bounding_boxes, settings) of the full-size frames
+        self._last_active = 0.0
+        self._last_kept = None  # timestamp of the last frame queued
+        self._interval = None  # average seconds between queued frames (EMA)
+        self._queue = deque()
+        self._max_queue = max_queue
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='clip-recorder', daemon=True)
+        self._thread.start()
+
+    @property
+    def rate(self):
+        """Measured frames per second of the recorded frames, or None before two frames were seen."""
+        return 1 / self._interval if self._interval else None
+
+    def _shrink(self, frame):
+        # Runs on the writer thread, on a private copy of the frame
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if self.jpeg_quality is not None:
+            return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])[1]
+        return frame
+
+    def set_privacy(self, frame_shape, bounding_boxes, **settings):
+        """Hide everything outside `bounding_boxes` (full-frame coordinates) in the clips, see PrivacyFilter."""
+        self._privacy = (tuple(frame_shape), list(bounding_boxes), settings)
+
+    def _privacy_filter(self, privacy, image_shape):
+        # Boxes scaled from the full frame to the shrunk frames that are written
+        (h, w), boxes, settings = privacy[0][:2], privacy[1], privacy[2]
+        sx, sy = image_shape[1] / w, image_shape[0] / h
+        boxes = [(round(x * sx), round(y * sy), round(bw * sx), round(bh * sy)) for x, y, bw, bh in boxes]
+        return PrivacyFilter(image_shape, boxes, **settings)
+
+    def _put(self, item):
+        with self._cond:
+            if len(self._queue) >= self._max_queue:
+                # Drop the oldest frame, never an open or close of a clip
+                oldest = next((queued for queued in self._queue if queued[0] == 'frame'), None)
+                if oldest is not None:
+                    self._queue.remove(oldest)
+                    self.dropped += 1
+            self._queue.append(item)
+            self._cond.notify()
+
+    def _keep(self, timestamp):
+        # Subsample to at most `fps` and measure the rate of the frames kept
+        if self._last_kept is not None:
+            interval = timestamp - self._last_kept
+            if self.fps and interval < 0.9 / self.fps:  # tolerate jitter around the target interval
+                return False
+            if interval > 0:
+                self._interval = interval if self._interval is None else 0.9 * self._interval + 0.1 * interval
+        self._last_kept = timestamp
+        return True
+
+    def update(self, frame, active_labels, timestamp=None):
+        """Offer one frame together with the labels of the bins active in it."""
+        timestamp = time.time() if timestamp is None else timestamp
+        keep = self._keep(timestamp)
+        if active_labels:
+            self._last_active = timestamp
+            if self.recording is None:
+                self._start(active_labels)
+        if keep:
+            if frame.ndim == 3 and frame.shape[2] == 4:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)  # raw screen captures, converted into a new array
+            else:
+                frame = frame.copy()  # capture buffers are reused
+            self._put(('frame', timestamp, frame))
+        if self.recording is not None and not active_labels and timestamp - self._last_active >= self.postroll:
+            self.stop()
+
+    def _start(self, labels):
+        prefix = f'{self.name}_' if self.name else ''
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.recording = os.path.join(self.directory, f'{prefix}{stamp}_{"-".join(labels)}_{self.clips}.mp4')
+        self.clips += 1
+        self._put(('open', self.recording, self.rate or self.fps or 15.0))
+
+    def stop(self):
+        """End the current clip, if any."""
+        if self.recording is not None:
+            self._put(('close', self.recording))
+            self.recording = None
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        preroll = deque()  # (timestamp, shrunk frame) of the last `preroll` seconds
+        writer, path, fps = None, None, None
+        privacy, privacy_filter = None, None
+
+        def write(small):
+            nonlocal writer, privacy, privacy_filter
+            image = cv2.imdecode(small, cv2.IMREAD_COLOR) if small.ndim == 1 else small
+            if self._privacy is not None:
+                if self._privacy is not privacy or privacy_filter.shape != image.shape:
+                    privacy = self._privacy
+                    privacy_filter = self._privacy_filter(privacy, image.shape)
+                privacy_filter.apply(image)  # the queued frames are private copies
+            if writer is None:
+                writer = cv2.VideoWriter(path, self.fourcc, fps, (image.shape[1], image.shape[0]))
+            writer.write(image)
+
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+                item = self._queue.popleft()
+            kind = item[0]
+            if kind == 'open':
+                _, path, fps = item
+                while preroll:
+                    write(preroll.popleft()[1])
+            elif kind == 'frame':
+                _, timestamp, frame = item
+                small = self._shrink(frame)
+                if path is not None:
+                    write(small)
+                    continue
+                preroll.append((timestamp, small))
+                while timestamp - preroll[0][0] > self.preroll:
+                    preroll.popleft()
+            elif kind == 'close':
+                if writer is not None:
+                    writer.release()
+                    print(f"Saved clip to {path} at {fps:.1f} FPS")
+                writer, path = None, None
+        if writer is not None:
+            writer.release()
+
+    def close(self, timeout=10.0):
+        """Finish the current clip, write out what is queued and stop the thread."""
+        self.stop()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
@@ -0,0 +1,168 @@
+from best_frame import BestFrameSelector
+
+IDLE = 'idle'
+MOTION = 'motion'
+SETTLING = 'settling'
+CLASSIFIED = 'classified'
+
+
+class DisposalEvent:
+    """One disposal into a bin: a debounced episode of motion."""
+
+    __slots__ = ('bin', 'label', 'start_time', 'end_time', 'start_frame', 'end_frame',
+                 'peak_frame', 'peak_score', 'best_frame', 'candidates', 'best_frames', 'detections',
+                 'classification')
+
+    def __init__(self, bin_index, label, timestamp, frame_index, score):
+        self.bin = bin_index
+        self.label = label
+        self.start_time = self.end_time = timestamp
+        self.start_frame = self.end_frame = frame_index
+        self.peak_frame = frame_index
+        self.peak_score = score
+        self.best_frame = None  # crop of the bin at the peak frame, or the best of best_frames
+        self.candidates = []  # top-k heap kept by a BestFrameSelector during the episode
+        self.best_frames = []  # (quality, frame_index, crop) best first, once the event is finished
+        self.detections = []  # detector output per classified crop
+        self.classification = None  # filled in by the classifier once the event is handed off
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def as_dict(self):
+        """Compact record of the event (without the frame itself)."""
+        return {
+            'bin': self.bin,
+            'label': self.label,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'start_frame': self.start_frame,
+            'end_frame': self.end_frame,
+            'peak_frame': self.peak_frame,
+            'peak_score': float(self.peak_score),
+            'best_frames': [frame_index for _, frame_index, _ in self.best_frames],
+            'classification': self.classification,
+        }
+
+
+class BinEventTracker:
+    """State machine turning one bin's per-frame motion scores into disposal events.
+
+    idle -> motion when the score reaches `enter_score`; motion -> settling when it
+    drops below `exit_score` (hysteresis); settling -> motion if it reaches
+    `enter_score` again, or -> classified after `settle_time` seconds of quiet, at
+    which point the event is emitted if its motion lasted at least `min_duration`.
+    Episodes longer than `max_duration` are closed and emitted regardless.
+    """
+
+    def __init__(self, bin_index, label, enter_score=0.005, exit_score=0.001, min_duration=0.3,
+                 settle_time=0.5, max_duration=30.0):
+        self.bin = bin_index
+        self.label = label
+        self.enter_score = enter_score
+        self.exit_score = exit_score
+        self.min_duration = min_duration
+        self.settle_time = settle_time
+        self.max_duration = max_duration
+        self.state = IDLE
+        self.event = None
+        self._quiet_since = 0.0
+
+    def _track(self, score, frame_index, timestamp, crop):
+        event = self.event
+        event.end_time = timestamp
+        event.end_frame = frame_index
+        if score > event.peak_score:
+            event.peak_score = score
+            event.peak_frame = frame_index
+            if crop is not None:
+                event.best_frame = crop()
+
+    def _finish(self):
+        event, self.event = self.event, None
+        if event.candidates:
+            event.best_frames = BestFrameSelector.select(event.candidates)
+            event.best_frame = event.best_frames[0][2]
+            event.candidates = []
+        if event.duration >= self.min_duration:
+            self.state = CLASSIFIED
+            return event
+        self.state = IDLE  # too short to be a disposal
+        return None
+
+    def update(self, score, frame_index, timestamp, crop=None):
+        """Advance the state machine by one frame, returns a finished DisposalEvent or None.
+
+        `crop` is an optional callable returning a copy of the bin ROI; it is only
+        called when the frame becomes the new peak of the episode.
+        """
+        if self.state in (IDLE, CLASSIFIED):
+            if score >= self.enter_score:
+                self.state = MOTION
+                self.event = DisposalEvent(self.bin, self.label, timestamp, frame_index, score)
+                if crop is not None:
+                    self.event.best_frame = crop()
+            else:
+                self.state = IDLE
+            return None
+
+        if self.state == MOTION:
+            if score >= self.exit_score:
+                self._track(score, frame_index, timestamp, crop)
+            else:
+                self.state = SETTLING
+                self._quiet_since = timestamp
+        elif self.state == SETTLING:
+            if score >= self.enter_score:
+                self.state = MOTION
+                self._track(score, frame_index, timestamp, crop)
+            elif timestamp - self._quiet_since >= self.settle_time:
+                return self._finish()
+
+        if self.event is not None and timestamp - self.event.start_time >= self.max_duration:
+            return self._finish()
+        return None
+
+    def flush(self):
+        """Close an open episode (e.g. at the end of a stream), returns the event or None."""
+        return self._finish() if self.event is not None else None
+
+
+class DisposalEventDetector:
+    """One BinEventTracker per bin, fed from a MotionEngine result array.
+
+    With a BestFrameSelector, every frame inside an episode is scored and the
+    event keeps its top-k crops instead of only the crop at the motion peak.
+    """
+
+    def __init__(self, bounding_boxes, bin_labels, selector=None, **kwargs):
+        self.bounding_boxes = bounding_boxes
+        self.selector = selector
+        self.trackers = [BinEventTracker(i, bin_labels[i], **kwargs) for i in range(len(bounding_boxes))]
+
+    def update(self, results, frame_index, timestamp, frame=None, engine=None):
+        """Feed one frame of per-bin results, returns the list of events finished on this frame.
+
+        If `frame` is given, events keep copies of their bin ROI: the top-k frames
+        when a selector and the MotionEngine are given, otherwise the peak frame.
+        """
+        select = self.selector is not None and engine is not None and frame is not None
+        events = []
+        for tracker, score, (x, y, w, h) in zip(self.trackers, results['score'], self.bounding_boxes):
+            crop = None if frame is None else (lambda x=x, y=y, w=w, h=h: frame[y:y+h, x:x+w].copy())
+            event = tracker.update(float(score), frame_index, timestamp, None if select else crop)
+            if event is not None:
+                events.append(event)
+            elif select and tracker.event is not None:
+                quality = self.selector.score(engine.roi_gray(tracker.bin), engine.roi_mask(tracker.bin))
+                if quality is not None:
+                    self.selector.offer(tracker.event.candidates, quality, frame_index, crop)
+        return events
+
+    def flush(self):
+        return [event for event in (t.flush() for t in self.trackers) if event is not None]
+
+    def active(self):
+        """Indices of the bins currently in an episode."""
+        return [t.bin for t in self.trackers if t.state in (MOTION, SETTLING)]
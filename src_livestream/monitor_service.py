@@ -0,0 +1,219 @@
+"""
+Monitor the bins of several cameras in one process with a shared pool of inference workers.
+
+Usage:
+    $ python src_livestream/monitor_service.py --source rtsp://cam1/stream --source rtsp://cam2/stream
+    $ python src_livestream/monitor_service.py --source src/video/bin_detection_7.mp4 --source src/video/bin_detection_8.mp4 --workers 2
+    $ python src_livestream/monitor_service.py --layout src_livestream/config/bin_layout.yaml --camera recorded
+"""
+
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from bin_detection_stream import (BEST_FRAMES, YOLO_WEIGHTS, bin_labels, bounding_boxes, create_snapshot_writer,
+                                  load_classifier)
+from bin_layout import LayoutWatcher
+from bin_monitor import BinMonitor
+from clip_recorder import ClipRecorder
+from screen_grabber import ScreenGrabber, screen_region
+
+
+class CameraRunner:
+    """Read frames from one source on its own thread and feed them to a BinMonitor.
+
+    Files stop at the end; live sources (URLs and device indices) are reopened
+    after `reconnect_delay` seconds when they drop. The source 'screen' grabs
+    `screen_region` of the screen (see screen_grabber) instead of a capture.
+    """
+
+    def __init__(self, monitor, source, reconnect_delay=2.0, screen_region=None):
+        self.monitor = monitor
+        self.source = int(source) if str(source).isnumeric() else source
+        self.screen_region = screen_region if self.source == 'screen' else None
+        self.live = isinstance(self.source, int) or '://' in str(self.source)
+        self.reconnect_delay = reconnect_delay
+        self.frames = 0
+        self.started = time.perf_counter()
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'camera-{monitor.name}', daemon=True)
+
+    def _grab_screen(self):
+        region = self.screen_region or screen_region()
+        grabber = ScreenGrabber(region)
+        frame = np.empty((region['height'], region['width'], 3), np.uint8)
+        while not self._stop.is_set():
+            grabber(frame)
+            self.monitor.process(frame)
+            self.frames += 1
+
+    def _read_capture(self):
+        while not self._stop.is_set():
+            cap = cv2.VideoCapture(self.source)
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                # Recorded files use their own clock so event durations match the video
+                timestamp = None if self.live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1E3
+                self.monitor.process(frame, timestamp)
+                self.frames += 1
+            cap.release()
+            if not self.live:
+                break
+            print(f"[{self.monitor.name}] stream lost, reconnecting in {self.reconnect_delay}s")
+            self._stop.wait(self.reconnect_delay)
+
+    def _run(self):
+        try:
+            if self.source == 'screen':
+                self._grab_screen()
+            else:
+                self._read_capture()
+        except Exception as e:
+            self.error = e
+            print(f"[{self.monitor.name}] stopped: {e}")
+        finally:
+            self.monitor.flush()
+
+    @property
+    def fps(self):
+        return self.frames / max(time.perf_counter() - self.started, 1e-9)
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+class MonitorSupervisor:
+    """Run one BinMonitor per camera, all sharing a ClassifierWorker pool and a SnapshotWriter.
+
+    Each monitor submits the best frames of its disposal events to the shared
+    pool, whose workers batch crops from every camera into a single
+    DetectMultiBackend forward call.
+    """
+
+    def __init__(self, runners, classifier=None, layout_watcher=None, snapshot_writer=None):
+        self.runners = runners
+        self.classifier = classifier
+        self.layout_watcher = layout_watcher
+        self.snapshot_writer = snapshot_writer
+
+    @classmethod
+    def from_sources(cls, sources, classifier=None, best_frames=BEST_FRAMES, names=None, record=None):
+        """One monitor per source, all using the bins configured for bin_detection_stream.
+
+        With `record` set to a directory, each monitor saves clips of its disposal episodes there.
+        """
+        snapshot_writer = create_snapshot_writer()
+        runners = []
+        for i, source in enumerate(sources):
+            name = names[i] if names else f'cam{i}'
+            monitor = BinMonitor(name, bounding_boxes, bin_labels, snapshot_writer=snapshot_writer,
+                                 classifier=classifier, best_frames=best_frames,
+                                 recorder=ClipRecorder(record, name) if record else None)
+            runners.append(CameraRunner(monitor, source))
+        return cls(runners, classifier, snapshot_writer=snapshot_writer)
+
+    @classmethod
+    def from_layout(cls, path, cameras=None, classifier=None, best_frames=BEST_FRAMES, record=None):
+        """One monitor per camera profile of a layout file; edits to the file are applied live."""
+        watcher = LayoutWatcher(path)
+        snapshot_writer = create_snapshot_writer()
+        runners = []
+        for profile in watcher.layout:
+            if cameras and profile.name not in cameras:
+                continue
+            if not profile.source:
+                raise ValueError(f"Camera {profile.name!r} in {path} has no source")
+            monitor = BinMonitor.from_profile(profile, snapshot_writer=snapshot_writer, classifier=classifier,
+                                              best_frames=best_frames,
+                                              recorder=ClipRecorder(record, profile.name) if record else None)
+            runners.append(CameraRunner(monitor, profile.source, screen_region=screen_region(profile.resolution)))
+        return cls(runners, classifier, watcher, snapshot_writer)
+
+    def reload_layout(self):
+        """Hand changed camera profiles to their monitors without stopping the readers."""
+        layout = self.layout_watcher.poll(time.monotonic()) if self.layout_watcher else None
+        if layout is not None:
+            for runner in self.runners:
+                if runner.monitor.name in layout.cameras:
+                    runner.monitor.apply_profile(layout[runner.monitor.name])
+
+    def summary(self):
+        lines = [f"{r.monitor.name}: {r.fps:6.1f} FPS, {r.frames} frames, "
+                 f"{sum(r.monitor.event_counts.values())} events{'' if r.alive else ' (stopped)'}" for r in self.runners]
+        if self.classifier is not None:
+            c = self.classifier
+            lines.append(f"inference: {c.inferred} crops in {c.batches} batches, {c.dropped} dropped, {c.failed} failed")
+        return '\n'.join(lines)
+
+    def run(self, stats_interval=10):
+        for runner in self.runners:
+            runner.start()
+        last_report = time.perf_counter()
+        try:
+            while any(r.alive for r in self.runners):
+                time.sleep(1)
+                self.reload_layout()
+                if stats_interval and time.perf_counter() - last_report >= stats_interval:
+                    print(self.summary())
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for runner in self.runners:
+                runner.stop()
+                if runner.monitor.recorder is not None:
+                    runner.monitor.recorder.close()
+            if self.classifier is not None:
+                self.classifier.close()
+            print(self.summary())
+            if self.snapshot_writer is not None:
+                self.snapshot_writer.close()
+
+
+def main(opt):
+    weights = opt.weights or YOLO_WEIGHTS
+    classifier = load_classifier(weights, workers=opt.workers) if weights else None
+    if opt.layout:
+        supervisor = MonitorSupervisor.from_layout(opt.layout, cameras=opt.camera, classifier=classifier,
+                                                   record=opt.record)
+    else:
+        supervisor = MonitorSupervisor.from_sources(opt.source, classifier=classifier, names=opt.name,
+                                                    record=opt.record)
+    supervisor.run(stats_interval=opt.stats_interval)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', action='append', help='video file, stream URL or device index (repeatable)')
+    parser.add_argument('--name', action='append', help='name per source, defaults to cam0, cam1, ...')
+    parser.add_argument('--layout', type=str, default='', help='bin layout file, runs one monitor per camera profile')
+    parser.add_argument('--camera', action='append', help='only run these camera profiles of the layout (repeatable)')
+    parser.add_argument('--weights', type=str, default='', help='YOLOv5 model for classification (default: YOLO_WEIGHTS)')
+    parser.add_argument('--workers', type=int, default=1, help='shared inference worker threads')
+    parser.add_argument('--record', type=str, default='', help='save clips of disposal episodes to this directory')
+    parser.add_argument('--stats-interval', type=int, default=10, help='seconds between status lines, 0 to disable')
+    opt = parser.parse_args()
+    if not opt.source and not opt.layout:
+        parser.error('give --source or --layout')
+    if opt.name and (not opt.source or len(opt.name) != len(opt.source)):
+        parser.error('--name must be given once per --source')
+    return opt
+
+
+if __name__ == "__main__":
+    main(parse_opt())
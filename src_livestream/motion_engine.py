@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+from background_model import BackgroundModel
+
+# Per-bin result record returned by MotionEngine.process
+RESULT_DTYPE = np.dtype([
+    ('motion', np.bool_),     # True when the bin has at least min_area moving pixels
+    ('pixels', np.int32),     # Number of moving pixels in the bin after dilation
+    ('score', np.float32),    # Fraction of the bin covered by motion (0..1)
+])
+
+
+class MotionEngine:
+    """Motion detection for all bins at once on the union of their ROIs.
+
+    The union of the bounding boxes is converted to grayscale and blurred once
+    per frame into preallocated buffers. A running-average BackgroundModel,
+    thresholding and dilation run over the whole union, the model ignoring the
+    gaps between bins, and the per-bin moving pixel counts are read from a
+    single integral image with vectorized corner lookups. Each bin's region of
+    the model can be reset independently.
+
+    Frames may be BGR or BGRA; BGRA frames (e.g. raw screen captures) are
+    converted to grayscale directly, without an intermediate BGR copy.
+    """
+
+    def __init__(self, bounding_boxes, frame_shape, threshold=50, blur_size=21,
+                 dilate_iterations=2, min_area=1, alpha=0.02, foreground_alpha=0.002, sigma=2.5, update_interval=4):
+        if not bounding_boxes:
+            raise ValueError("MotionEngine needs at least one bounding box")
+
+        frame_h, frame_w = frame_shape[:2]
+        boxes = np.asarray(bounding_boxes, dtype=np.int32).reshape(-1, 4)
+        x0, y0 = boxes[:, 0], boxes[:, 1]
+        x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+        if (x0 < 0).any() or (y0 < 0).any() or (x1 > frame_w).any() or (y1 > frame_h).any():
+            raise ValueError(f"Bounding boxes {bounding_boxes} do not fit in a {frame_w}x{frame_h} frame")
+
+        self.bounding_boxes = [tuple(int(v) for v in box) for box in boxes]
+        self.frame_shape = (frame_h, frame_w)
+        self.threshold = threshold
+        self.blur_size = (blur_size, blur_size)
+        self.dilate_iterations = dilate_iterations
+        self.min_area = min_area
+
+        # Union of all ROIs, everything below works relative to its top-left corner
+        ux0, uy0, ux1, uy1 = int(x0.min()), int(y0.min()), int(x1.max()), int(y1.max())
+        self.union = (slice(uy0, uy1), slice(ux0, ux1))
+        self.roi_slices = [(slice(int(a) - uy0, int(b) - uy0), slice(int(c) - ux0, int(d) - ux0))
+                           for a, b, c, d in zip(y0, y1, x0, x1)]
+
+        # Integral image corners for every bin (integral has one extra row and column)
+        self._ry0, self._ry1 = y0 - uy0, y1 - uy0
+        self._rx0, self._rx1 = x0 - ux0, x1 - ux0
+        self._areas = (boxes[:, 2] * boxes[:, 3]).astype(np.float32)
+
+        shape = (uy1 - uy0, ux1 - ux0)
+        self._gray = np.empty(shape, np.uint8)
+        self._blurred = np.empty(shape, np.uint8)
+        roi_mask = np.zeros(shape, np.uint8)
+        for roi in self.roi_slices:
+            roi_mask[roi] = 255
+        self.background_model = BackgroundModel(shape, alpha=alpha, foreground_alpha=foreground_alpha,
+                                                threshold=threshold, sigma=sigma, update_interval=update_interval,
+                                                mask=None if roi_mask.all() else roi_mask)
+        self._thresh = np.empty(shape, np.uint8)
+        self.mask = np.empty(shape, np.uint8)
+        self._integral = np.empty((shape[0] + 1, shape[1] + 1), np.int32)
+        self.results = np.zeros(len(self.bounding_boxes), dtype=RESULT_DTYPE)
+        self.initialized = False
+
+    def _prepare(self, frame):
+        """Convert and blur the ROI union of the frame into the preallocated buffers."""
+        if frame.shape[:2] != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape[:2]} does not match engine shape {self.frame_shape}")
+        code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        cv2.cvtColor(frame[self.union], code, dst=self._gray)
+        cv2.GaussianBlur(self._gray, self.blur_size, 0, dst=self._blurred)
+        return self._blurred
+
+    def set_background(self, frame, index=None):
+        """Use the frame as the reference for all bins, or only for bin `index`."""
+        blurred = self._prepare(frame)
+        if index is None:
+            self.background_model.initialize(blurred)
+            self.initialized = True
+        else:
+            self.background_model.initialize(blurred, self.roi_slices[index])
+
+    def roi_gray(self, index):
+        """Return a view of the unblurred grayscale of bin `index` from the last frame."""
+        return self._gray[self.roi_slices[index]]
+
+    def roi_mask(self, index):
+        """Return a view of the motion mask of bin `index` from the last frame."""
+        return self.mask[self.roi_slices[index]]
+
+    def process(self, frame):
+        """Run motion detection for every bin and return the per-bin result array.
+
+        The returned array (and `self.mask`) are reused on the next call.
+        """
+        if not self.initialized:
+            self.set_background(frame)
+            self.results[:] = 0
+            return self.results
+
+        blurred = self._prepare(frame)
+        self.background_model.apply(blurred, out=self._thresh)
+        cv2.dilate(self._thresh, None, dst=self.mask, iterations=self.dilate_iterations)
+
+        # Moving pixel count for every bin from four integral lookups each
+        cv2.integral(self.mask, sum=self._integral, sdepth=cv2.CV_32S)
+        ii = self._integral
+        sums = ii[self._ry1, self._rx1] - ii[self._ry0, self._rx1] - ii[self._ry1, self._rx0] + ii[self._ry0, self._rx0]
+        pixels = sums // 255
+
+        self.results['pixels'] = pixels
+        self.results['score'] = pixels / self._areas
+        self.results['motion'] = pixels >= self.min_area
+        return self.results
@@ -0,0 +1,273 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+END = (None, None)  # queued by FrameRing.finish after the last frame of the stream
+
+
+def to_bgr(frame, out=None):
+    """Return a BGR version of a BGR or BGRA frame, converting only when needed."""
+    if frame.ndim == 3 and frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=out)
+    return frame
+
+
+class StageStats:
+    """Throughput and latency counters for one pipeline stage."""
+
+    def __init__(self, name, smoothing=0.1):
+        self.name = name
+        self.smoothing = smoothing
+        self.frames = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self.latency = 0.0  # exponential moving average of the per-frame work time, in seconds
+        self.started = time.perf_counter()
+
+    def record(self, start, end):
+        elapsed = end - start
+        self.latency = elapsed if self.frames == 0 else self.latency + self.smoothing * (elapsed - self.latency)
+        self.frames += 1
+        self.busy += elapsed
+
+    @property
+    def fps(self):
+        return self.frames / max(time.perf_counter() - self.started, 1e-9)
+
+    @property
+    def utilization(self):
+        return self.busy / max(time.perf_counter() - self.started, 1e-9)
+
+    def summary(self):
+        return (f"{self.name}: {self.fps:6.1f} FPS, {self.latency * 1E3:6.1f} ms/frame, "
+                f"{self.utilization:4.0%} busy, {self.dropped} dropped")
+
+
+class FramePool:
+    """Fixed set of preallocated frames handed out by index.
+
+    With shape=None the slots start empty and are filled by adopting arrays from
+    the producer, which lets a capture source hand over its own buffer without a copy.
+    """
+
+    def __init__(self, size, shape, dtype=np.uint8):
+        self.frames = [None if shape is None else np.empty(shape, dtype) for _ in range(size)]
+        self._free = deque(range(size))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return the index of a free frame, or None if all frames are in use."""
+        with self._lock:
+            return self._free.popleft() if self._free else None
+
+    def release(self, index):
+        with self._lock:
+            self._free.append(index)
+
+
+class FrameRing:
+    """Bounded queue of (frame index, metadata) between two stages.
+
+    When the ring is full, `drop_oldest` evicts the oldest queued frame to make
+    room and `drop_newest` rejects the frame being put. Dropped frames go back
+    to the pool. `finish` queues END behind the remaining frames so the consumer
+    drains them, `close` aborts and releases them at once.
+    """
+
+    def __init__(self, pool, capacity, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown backpressure policy {policy!r}")
+        self.pool = pool
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._finished = False
+
+    def put(self, index, meta=None):
+        """Queue a frame, returns False if it was dropped."""
+        with self._cond:
+            if self._closed or self._finished:
+                self.pool.release(index)
+                return False
+            if len(self._items) >= self.capacity:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    self.pool.release(index)
+                    return False
+                old_index, _ = self._items.popleft()  # never END, nothing is put after it
+                self.pool.release(old_index)
+            self._items.append((index, meta))
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Return the next (index, meta), END after the last frame, or None on timeout or once closed."""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def finish(self):
+        """Mark the end of the stream, the frames already queued are still delivered."""
+        with self._cond:
+            if not self._finished and not self._closed:
+                self._finished = True
+                self._items.append(END)
+                self._cond.notify_all()
+
+    def close(self):
+        """Abort, releasing the queued frames to the pool."""
+        with self._cond:
+            self._closed = True
+            while self._items:
+                index, _ = self._items.popleft()
+                if index is not None:
+                    self.pool.release(index)
+            self._cond.notify_all()
+
+
+class FramePipeline:
+    """Grab -> process -> render pipeline with one thread per stage.
+
+    `grab(frame)` fills a preallocated frame in place and returns False to stop. It
+    may instead return a new array, which the slot adopts without copying (pass
+    frame_shape=None in that case).
+    `process(frame)` returns the frame to render (usually the same array).
+    `render(frame, meta)` runs on the thread calling `run` and returns False to stop,
+    so GUI calls like cv2.imshow stay on the main thread.
+    When `grab` ends the stream, the frames still queued are processed and rendered
+    before `run` returns; an error or `stop` discards them.
+    """
+
+    def __init__(self, grab, process, frame_shape, capacity=2, policy=DROP_OLDEST, max_fps=0):
+        # Every ring can be full while each stage holds one more frame
+        self.pool = FramePool(2 * capacity + 3, frame_shape)
+        self.captured = FrameRing(self.pool, capacity, policy)
+        self.processed = FrameRing(self.pool, capacity, policy)
+        self.grab = grab
+        self.process = process
+        self.min_interval = 1 / max_fps if max_fps else 0
+        self.stats = {name: StageStats(name) for name in ('grab', 'process', 'render')}
+        self.latency = 0.0  # end-to-end capture to render latency (EMA, seconds)
+        self._stop = threading.Event()
+        self._error = None
+        self._threads = []
+
+    def _grab_loop(self):
+        stats = self.stats['grab']
+        frame_id = 0
+        try:
+            while not self._stop.is_set():
+                index = self.pool.acquire()
+                if index is None:
+                    stats.dropped += 1
+                    time.sleep(0.001)
+                    continue
+                t0 = time.perf_counter()
+                result = self.grab(self.pool.frames[index])
+                if result is False:
+                    self.pool.release(index)
+                    break
+                if isinstance(result, np.ndarray):
+                    self.pool.frames[index] = result
+                t1 = time.perf_counter()
+                stats.record(t0, t1)
+                self.captured.put(index, (frame_id, t0))  # backpressure drops are counted by the ring
+                frame_id += 1
+                if self.min_interval:
+                    time.sleep(max(self.min_interval - (time.perf_counter() - t0), 0))
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+            self.captured.close()
+        else:
+            self.captured.finish()
+
+    def _process_loop(self):
+        stats = self.stats['process']
+        try:
+            while True:
+                item = self.captured.get(timeout=0.1)
+                if item is None:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is END:
+                    break
+                index, meta = item
+                frame = self.pool.frames[index]
+                t0 = time.perf_counter()
+                out = self.process(frame)
+                if out is not None and out is not frame:
+                    np.copyto(frame, out)
+                stats.record(t0, time.perf_counter())
+                self.processed.put(index, meta)
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+            self.processed.close()
+        else:
+            self.processed.finish()
+
+    def start(self):
+        for name, target in (('grab', self._grab_loop), ('process', self._process_loop)):
+            thread = threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.captured.close()
+        self.processed.close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run(self, render, stats_interval=0):
+        """Start the worker stages and render frames on this thread until a stage stops."""
+        stats = self.stats['render']
+        last_report = time.perf_counter()
+        self.start()
+        try:
+            while True:
+                item = self.processed.get(timeout=0.1)
+                if item is None:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is END:
+                    break
+                index, meta = item
+                t0 = time.perf_counter()
+                try:
+                    keep_going = render(self.pool.frames[index], meta)
+                finally:
+                    self.pool.release(index)
+                t1 = time.perf_counter()
+                stats.record(t0, t1)
+                age = t1 - meta[1]
+                self.latency = age if stats.frames == 1 else self.latency + 0.1 * (age - self.latency)
+                if keep_going is False:
+                    break
+                if stats_interval and t1 - last_report >= stats_interval:
+                    print(self.summary())
+                    last_report = t1
+        finally:
+            self.stop()
+        if self._error is not None:
+            raise self._error
+
+    def summary(self):
+        rings = {'grab': self.captured, 'process': self.processed}  # the queue each stage feeds
+        lines = [s.summary() + (f", {rings[name].dropped} dropped from queue" if name in rings else '')
+                 for name, s in self.stats.items()]
+        lines.append(f"end-to-end: {self.latency * 1E3:.1f} ms")
+        return '\n'.join(lines)
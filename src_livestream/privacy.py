@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+PRIVACY_MODES = ('blur', 'pixelate')
+
+
+def complement_rects(frame_shape, boxes):
+    """Split the part of the frame outside all (x, y, w, h) boxes into disjoint rectangles.
+
+    The frame is cut into horizontal bands at every box edge; the uncovered
+    spans of each band become rectangles, and vertically adjacent rectangles
+    with the same span are merged.
+    """
+    h, w = frame_shape[:2]
+    boxes = [(max(x, 0), max(y, 0), min(x + bw, w), min(y + bh, h)) for x, y, bw, bh in boxes]
+    edges = sorted({0, h, *(b[1] for b in boxes), *(b[3] for b in boxes)})
+    rects = []
+    open_rects = {}  # (x0, x1) -> index in rects of the rectangle ending at the current band
+    for y0, y1 in zip(edges[:-1], edges[1:]):
+        covered = sorted((b[0], b[2]) for b in boxes if b[1] <= y0 and b[3] >= y1)
+        spans, x = [], 0
+        for bx0, bx1 in covered:
+            if bx0 > x:
+                spans.append((x, bx0))
+            x = max(x, bx1)
+        if x < w:
+            spans.append((x, w))
+
+        still_open = {}
+        for span in spans:
+            if span in open_rects:
+                i = open_rects[span]
+                rx, ry, rw, _ = rects[i]
+                rects[i] = (rx, ry, rw, y1 - ry)
+            else:
+                i = len(rects)
+                rects.append((span[0], y0, span[1] - span[0], y1 - y0))
+            still_open[span] = i
+        open_rects = still_open
+    return rects
+
+
+class PrivacyFilter:
+    """Blur or pixelate everything outside the bin boxes, in place.
+
+    Only the complement of the boxes is touched, as a few precomputed
+    rectangles, so the cost shrinks with the area left to hide. With
+    `downscale` > 1 each rectangle is shrunk into a preallocated buffer, blurred
+    there and scaled back, which keeps a strong blur cheap. In 'pixelate' mode
+    rectangles are shrunk by `strength` and scaled back with nearest-neighbour.
+    """
+
+    def __init__(self, frame_shape, bounding_boxes, mode='blur', strength=31, downscale=4):
+        if mode not in PRIVACY_MODES:
+            raise ValueError(f"Privacy mode must be one of {', '.join(PRIVACY_MODES)}, got {mode!r}")
+        self.shape = tuple(frame_shape)
+        self.mode = mode
+        self.strength = max(int(strength), 1)
+        self.downscale = max(int(downscale), 1)
+        self.rects = complement_rects(frame_shape, bounding_boxes)
+
+        # Working buffers per rectangle, allocated once
+        factor = self.strength if mode == 'pixelate' else self.downscale
+        ksize = max(self.strength // self.downscale, 1) | 1
+        self.ksize = (ksize, ksize)
+        self._small = []
+        for x, y, w, h in self.rects:
+            size = (max(w // factor, 1), max(h // factor, 1))
+            self._small.append(np.empty((size[1], size[0]) + self.shape[2:], np.uint8) if factor > 1 else None)
+
+    @classmethod
+    def from_profile(cls, profile, frame_shape, bounding_boxes=None):
+        """Filter for the bins of a CameraProfile, with its `privacy` settings."""
+        return cls(frame_shape, bounding_boxes or profile.bounding_boxes, **profile.privacy)
+
+    def apply(self, frame):
+        """Hide everything outside the bins of `frame` in place and return it."""
+        if frame.shape != self.shape:
+            raise ValueError(f"Privacy filter built for {self.shape} frames, got {frame.shape}")
+        for (x, y, w, h), small in zip(self.rects, self._small):
+            region = frame[y:y + h, x:x + w]
+            if small is None:
+                cv2.GaussianBlur(region, self.ksize, 0, dst=region)
+                continue
+            cv2.resize(region, (small.shape[1], small.shape[0]), dst=small, interpolation=cv2.INTER_AREA)
+            if self.mode == 'pixelate':
+                cv2.resize(small, (w, h), dst=region, interpolation=cv2.INTER_NEAREST)
+            else:
+                cv2.GaussianBlur(small, self.ksize, 0, dst=small)
+                cv2.resize(small, (w, h), dst=region, interpolation=cv2.INTER_LINEAR)
+        return frame
@@ -0,0 +1,202 @@
+"""
+Replay recorded bin videos through the live BinMonitor headlessly and report throughput.
+
+Every frame is processed (no dropping) as fast as possible, with decoding on a
+separate thread. Frames/sec, per-frame latency percentiles and disposal event
+counts are printed per video and written, with every event and its
+classification (with --weights), to a JSON file so runs can be compared across
+commits.
+
+Usage:
+    $ python src_livestream/replay.py src/video
+    $ python src_livestream/replay.py src/video/bin_detection_7.mp4 src/video/bin_detection_8.mp4 --output replay.json
+"""
+
+import argparse
+import json
+import queue
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from bin_layout import DEFAULT_LAYOUT, load_layout
+from bin_monitor import BinMonitor
+
+VID_FORMATS = ('.asf', '.avi', '.gif', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg', '.mpg', '.ts', '.wmv')
+
+
+class VideoDecoder:
+    """Decode a video on a background thread into a bounded queue of reused frame buffers.
+
+    The decoder blocks when `depth` frames are waiting, so no frame is dropped.
+    Iterating yields (frame, timestamp in seconds); the previous frame's buffer
+    is recycled when the next one is requested.
+    """
+
+    def __init__(self, path, depth=8):
+        self.path = str(path)
+        self.decode_time = 0.0
+        self.error = None
+        self._ready = queue.Queue(maxsize=depth)
+        self._free = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='video-decoder', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            if not cap.isOpened():
+                raise OSError(f"Failed to open {self.path}")
+            while not self._stop.is_set():
+                try:
+                    buf = self._free.get_nowait()
+                except queue.Empty:
+                    buf = None
+                t = time.perf_counter()
+                ret, frame = cap.read(buf)
+                self.decode_time += time.perf_counter() - t
+                if not ret:
+                    break
+                self._ready.put((frame, cap.get(cv2.CAP_PROP_POS_MSEC) / 1E3))
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self._ready.put(None)
+
+    def __iter__(self):
+        previous = None
+        while True:
+            item = self._ready.get()
+            if previous is not None:
+                self._free.put(previous)
+            if item is None:
+                break
+            previous = item[0]
+            yield item
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self._stop.set()
+        while self._thread.is_alive():  # unblock a decoder waiting on a full queue
+            try:
+                self._ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def replay_video(path, profile, depth=8, classifier=None):
+    """Run one video through a fresh BinMonitor, returns its metrics and disposal events as a dict.
+
+    With a classifier (ClassifierWorker), waits until the events of the video are classified.
+    """
+    monitor = BinMonitor.from_profile(profile, classifier=classifier, keep_events=None)
+    monitor.name = Path(path).stem
+    decoder = VideoDecoder(path, depth)
+    latencies = []
+    t0 = time.perf_counter()
+    try:
+        for frame, timestamp in decoder:
+            t = time.perf_counter()
+            monitor.process(frame, timestamp)
+            latencies.append(time.perf_counter() - t)
+        monitor.flush()
+    finally:
+        decoder.close()
+    wall = time.perf_counter() - t0
+    if classifier is not None:
+        classifier.join()
+
+    latencies = np.array(latencies) * 1E3
+    p50, p99 = np.percentile(latencies, (50, 99)) if len(latencies) else (0.0, 0.0)
+    return {
+        'video': str(path),
+        'frames': len(latencies),
+        'wall_seconds': round(wall, 3),
+        'fps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'decode_seconds': round(decoder.decode_time, 3),
+        'latency_ms': {'mean': round(float(latencies.mean()), 3) if len(latencies) else 0.0,
+                       'p50': round(float(p50), 3), 'p99': round(float(p99), 3)},
+        'events': sum(monitor.event_counts.values()),
+        'events_per_bin': {label: monitor.event_counts[label] for label in profile.bin_labels},
+        'disposals': [event.as_dict() for event in monitor.completed_events],
+    }
+
+
+def git_commit():
+    """Current git commit of the repo, if available."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def collect_videos(sources):
+    videos = []
+    for source in sources:
+        p = Path(source)
+        if p.is_dir():
+            videos += sorted(f for f in p.rglob('*') if f.suffix.lower() in VID_FORMATS)
+        elif p.exists():
+            videos.append(p)
+        else:
+            print(f"Skipping {source}: not found")
+    return videos
+
+
+def main(opt):
+    profile = load_layout(opt.layout)[opt.camera]
+    classifier = None
+    if opt.weights:
+        from bin_detection_stream import load_classifier  # scoped so torch is only imported when enabled
+        classifier = load_classifier(opt.weights)
+
+    results = []
+    for video in collect_videos(opt.source):
+        r = replay_video(video, profile, opt.depth, classifier)
+        results.append(r)
+        print(f"{r['video']}: {r['frames']} frames, {r['fps']:.1f} FPS, "
+              f"p50 {r['latency_ms']['p50']:.2f} ms, p99 {r['latency_ms']['p99']:.2f} ms, {r['events']} events")
+        if classifier is not None:
+            for disposal in r['disposals']:
+                print(f"  {disposal['label']} at {disposal['start_time']:.1f}s: {disposal['classification']}")
+    if classifier is not None:
+        classifier.close()
+
+    frames = sum(r['frames'] for r in results)
+    wall = sum(r['wall_seconds'] for r in results)
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'layout': str(opt.layout),
+        'camera': opt.camera,
+        'videos': results,
+        'total': {'videos': len(results), 'frames': frames, 'wall_seconds': round(wall, 3),
+                  'fps': round(frames / wall, 2) if wall else 0.0,
+                  'events': sum(r['events'] for r in results)},
+    }
+    with open(opt.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(results)} videos, {frames} frames, {report['total']['fps']:.1f} FPS overall, results saved to {opt.output}")
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', nargs='+', help='video files or directories of videos')
+    parser.add_argument('--layout', type=str, default=str(DEFAULT_LAYOUT), help='bin layout file')
+    parser.add_argument('--camera', type=str, default='recorded', help='camera profile of the layout')
+    parser.add_argument('--output', type=str, default='replay.json', help='JSON results file')
+    parser.add_argument('--depth', type=int, default=8, help='decoded frames buffered ahead of processing')
+    parser.add_argument('--weights', type=str, default='', help='optional YOLOv5 model to classify events')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
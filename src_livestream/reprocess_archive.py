@@ -0,0 +1,179 @@
+"""
+Reprocess a directory of archived bin videos on a process pool and write one row per disposal event.
+
+Each worker decodes only the bin region of its video (see ClipDecoder), runs it
+through a BinMonitor and, with --weights, classifies the best frames of every
+event with YOLOv5. Finished videos are checkpointed as part files next to the
+output, so an interrupted run resumes with the videos it has not done yet.
+The rows are written to CSV, or Parquet when the output ends in .parquet.
+
+Usage:
+    $ python src_livestream/reprocess_archive.py archive/ --output events.csv --workers 8
+    $ python src_livestream/reprocess_archive.py archive/ --output events.parquet --weights best.pt --stride 2
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+
+from bin_layout import DEFAULT_LAYOUT, load_layout
+from bin_monitor import BinMonitor
+from clip_decoder import ClipDecoder
+from replay import collect_videos
+
+# Columns of the output, in order
+COLUMNS = ('video', 'bin', 'label', 'start_time', 'end_time', 'duration', 'start_frame', 'end_frame',
+           'peak_frame', 'peak_score', 'classification', 'confidence')
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(layout, camera, weights, imgsz, device):
+    cv2.setNumThreads(1)  # parallelism comes from the process pool
+    _worker['profile'] = load_layout(layout)[camera]
+    _worker['classifier'] = None
+    if weights:
+        from waste_classifier import WasteClassifier  # scoped so torch is only imported when enabled
+        _worker['classifier'] = WasteClassifier(weights, device=device, imgsz=imgsz)
+
+
+def classify_events(classifier, events, batch_size=16):
+    """Classify each event from the most confident of its best frames, in batches.
+
+    Sets event.classification and returns the confidence of each event by id.
+    """
+    jobs = [(event, crop) for event in events for crop in ([c for _, _, c in event.best_frames] or
+                                                           [event.best_frame]) if crop is not None]
+    best = {}
+    for i in range(0, len(jobs), batch_size):
+        batch = jobs[i:i + batch_size]
+        images, shapes = zip(*(classifier.preprocess(crop) for _, crop in batch))
+        for (event, _), det in zip(batch, classifier.infer(list(images), list(shapes))):
+            conf = float(det[:, 4].max()) if len(det) else 0.0
+            if id(event) not in best or conf > best[id(event)][1]:
+                best[id(event)] = (det, conf)
+    for event in events:
+        if id(event) in best:
+            event.classification = classifier.describe(best[id(event)][0])
+    return {key: conf for key, (_, conf) in best.items()}
+
+
+def process_video(path, stride=1, scale=1.0):
+    """Run one video through motion segmentation and classification, returns its summary and event rows."""
+    profile, classifier = _worker['profile'], _worker['classifier']
+    t0 = time.perf_counter()
+    with ClipDecoder(path, stride=stride, scale=scale, roi=profile.union) as decoder:
+        profile.validate(decoder.source_shape)
+        # Blur scaled with the decoded region, like the boxes
+        engine_kwargs = profile.engine_kwargs()
+        engine_kwargs['blur_size'] = max(int(engine_kwargs.get('blur_size', 21) * scale) | 1, 3)
+        monitor = BinMonitor(Path(path).stem, [decoder.map_box(b) for b in profile.bounding_boxes],
+                             profile.bin_labels, engine_kwargs=engine_kwargs,
+                             event_kwargs=dict(profile.events), keep_events=None)
+        last = 0.0
+        for index, timestamp, frame in decoder:
+            monitor.process(frame, timestamp, index)  # event frames are source frame indices whatever the stride
+            last = timestamp
+        monitor.flush()
+        video_seconds = decoder.frame_count / decoder.fps if decoder.frame_count > 0 else last
+
+    events = list(monitor.completed_events)
+    confidence = classify_events(classifier, events) if classifier is not None else {}
+    rows = []
+    for event in events:
+        row = {k: v for k, v in event.as_dict().items() if k in COLUMNS}
+        row.update(video=str(path), duration=round(event.duration, 3),
+                   confidence=round(confidence.get(id(event), 0.0), 4) if classifier is not None else None)
+        rows.append(row)
+    return {'video': str(path), 'video_seconds': round(video_seconds, 3), 'frames': decoder.frames,
+            'decoded': decoder.decoded, 'wall_seconds': round(time.perf_counter() - t0, 3), 'events': rows}
+
+
+def part_path(parts_dir, video):
+    """Checkpoint file of one video, unique per absolute path."""
+    digest = hashlib.sha1(str(Path(video).resolve()).encode()).hexdigest()[:12]
+    return parts_dir / f'{Path(video).stem}-{digest}.json'
+
+
+def write_output(path, rows):
+    if str(path).endswith('.parquet'):
+        import pyarrow as pa  # scoped so pyarrow is only required for Parquet output
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(rows) if rows else pa.table({c: [] for c in COLUMNS}), path)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(opt):
+    output = Path(opt.output)
+    parts_dir = output.with_name(output.name + '.parts')
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    videos = collect_videos(opt.source)
+    todo = [v for v in videos if not part_path(parts_dir, v).exists()]
+    print(f"{len(videos)} videos, {len(videos) - len(todo)} already done, {len(todo)} to process")
+
+    t0 = time.perf_counter()
+    video_seconds = 0.0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=opt.workers, initializer=_init_worker,
+                             initargs=(opt.layout, opt.camera, opt.weights, opt.imgsz, opt.device)) as pool:
+        futures = {pool.submit(process_video, v, opt.stride, opt.scale): v for v in todo}
+        for n, future in enumerate(as_completed(futures), 1):
+            video = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{n}/{len(todo)}] {video}: failed: {e}")
+                continue
+            # Checkpoint: write to a temporary file and rename so a part is never half written
+            part = part_path(parts_dir, video)
+            tmp = part.with_suffix('.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp, part)
+            video_seconds += result['video_seconds']
+            wall = time.perf_counter() - t0
+            print(f"[{n}/{len(todo)}] {video}: {len(result['events'])} events, "
+                  f"{result['video_seconds'] / max(result['wall_seconds'], 1e-9):.1f}x realtime, "
+                  f"overall {video_seconds / wall:.1f} video-s/s")
+
+    rows = []
+    for part in sorted(parts_dir.glob('*.json')):
+        with open(part) as f:
+            rows += json.load(f)['events']
+    write_output(output, rows)
+    wall = time.perf_counter() - t0
+    print(f"Processed {len(todo) - failed} videos ({video_seconds:.0f} video-seconds) in {wall:.1f}s: "
+          f"{video_seconds / wall if wall else 0.0:.1f} video-seconds per second, {failed} failed. "
+          f"{len(rows)} events saved to {output}")
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', nargs='+', help='video files or directories of videos')
+    parser.add_argument('--output', type=str, default='events.csv', help='CSV or .parquet file of event rows')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes')
+    parser.add_argument('--layout', type=str, default=str(DEFAULT_LAYOUT), help='bin layout file')
+    parser.add_argument('--camera', type=str, default='recorded', help='camera profile of the layout')
+    parser.add_argument('--stride', type=int, default=1, help='process every Nth frame')
+    parser.add_argument('--scale', type=float, default=1.0, help='downscale the bin region before processing')
+    parser.add_argument('--weights', type=str, default='', help='optional YOLOv5 model to classify events')
+    parser.add_argument('--imgsz', type=int, default=320, help='inference size')
+    parser.add_argument('--device', type=str, default='cpu', help='cuda device, i.e. 0 or cpu')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_opt())
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+from mss import mss
+
+# Screen region of the Chrome window showing the Nest live stream (adjust to your window)
+SCREEN_REGION = {"top": 236, "left": 24, "width": 1439, "height": 807}
+
+
+def screen_region(resolution=None):
+    """The capture region, sized to a (width, height) resolution when given."""
+    region = dict(SCREEN_REGION)
+    if resolution:
+        region["width"], region["height"] = resolution
+    return region
+
+
+class ScreenGrabber:
+    """Grab the monitor region into a preallocated BGR frame.
+
+    With zero_copy=True the raw BGRA buffer of each screenshot is wrapped as a
+    numpy view and returned as the frame instead, skipping both the np.array copy
+    and the BGR conversion. The motion engine reads BGRA directly and cv2.imshow
+    displays it, so a BGR copy is only made where one is needed (see to_bgr).
+    The mss instance is created on first use so that it belongs to the grab thread.
+    """
+
+    def __init__(self, monitor, zero_copy=False):
+        self.monitor = monitor
+        self.zero_copy = zero_copy
+        self._sct = None
+
+    def __call__(self, frame):
+        if self._sct is None:
+            self._sct = mss()
+        screenshot = self._sct.grab(self.monitor)
+
+        if self.zero_copy:
+            # View the writable BGRA bytearray of the screenshot without copying it
+            return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+        img = np.array(screenshot)
+
+        # Convert to a format OpenCV can use (from BGRA to BGR) straight into the pipeline frame
+        cv2.cvtColor(img, cv2.COLOR_BGRA2BGR, dst=frame)
+        return True
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class SnapshotWriter:
+    """Write inspection snapshots and status messages from a background thread.
+
+    `save` and `log` only copy the data into a bounded queue; when the queue is
+    full the oldest entry is dropped, so the capture thread never waits on disk
+    or stdout. Snapshots are rate limited per key (usually the bin index), and
+    a disabled writer discards everything without starting a thread.
+    """
+
+    def __init__(self, directory=os.path.join('src_livestream', 'images'), max_queue=16, min_interval=1.0,
+                 enabled=True):
+        self.directory = directory
+        self.min_interval = min_interval
+        self.enabled = enabled
+        self.dropped = 0
+        self._queue = deque(maxlen=max_queue)
+        self._cond = threading.Condition()
+        self._last_saved = {}
+        self._closed = False
+        self._thread = None
+        if enabled:
+            self._thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+            self._thread.start()
+
+    def _put(self, item):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1  # deque drops the oldest entry on append
+            self._queue.append(item)
+            self._cond.notify()
+
+    def save(self, key, filename, image, force=False):
+        """Queue a copy of the image for writing, unless `key` was saved within min_interval.
+
+        Returns True if the snapshot was queued.
+        """
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_saved.get(key, -self.min_interval) < self.min_interval:
+            return False
+        self._last_saved[key] = now
+        self._put(('image', filename, image.copy()))
+        return True
+
+    def log(self, message):
+        """Queue a status message to be printed by the writer thread."""
+        if self.enabled:
+            self._put(('log', message, None))
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                kind, payload, image = self._queue.popleft()
+            if kind == 'image':
+                path = os.path.join(self.directory, payload)
+                if image.ndim == 3 and image.shape[2] == 4:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)  # raw screen captures
+                if cv2.imwrite(path, image):
+                    print(f"Saved snapshot to {path}")
+                else:
+                    print(f"Failed to save snapshot to {path}")
+            else:
+                print(payload)
+
+    def close(self, timeout=5.0):
+        """Write out what is left in the queue and stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,177 @@
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Make the vendored YOLOv5 packages importable
+YOLOV5 = Path(__file__).resolve().parents[1] / 'yolov5'
+if str(YOLOV5) not in sys.path:
+    sys.path.append(str(YOLOV5))
+
+from models.common import DetectMultiBackend
+from utils.augmentations import letterbox
+from utils.general import LOGGER, check_img_size, non_max_suppression, scale_boxes
+from utils.torch_utils import select_device, smart_inference_mode
+
+from pipeline import to_bgr
+
+
+class WasteClassifier:
+    """A loaded YOLOv5 DetectMultiBackend that classifies bin ROI crops.
+
+    Crops are letterboxed to one small fixed size, so every call has the same
+    input shape and the model stays warm between motion events.
+    """
+
+    def __init__(self, weights, device='', imgsz=320, conf_thres=0.25, iou_thres=0.45, max_det=100,
+                 half=False, data=None):
+        self.device = select_device(device)
+        self.model = DetectMultiBackend(weights, device=self.device, data=data, fp16=half)
+        self.names = self.model.names
+        self.imgsz = tuple(check_img_size((imgsz, imgsz) if isinstance(imgsz, int) else imgsz, s=self.model.stride))
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.max_det = max_det
+
+        # Only the PyTorch and Triton backends accept a variable batch size
+        self.dynamic_batch = self.model.pt or self.model.triton
+        self.model.warmup(imgsz=(1, 3, *self.imgsz))
+
+    def preprocess(self, crop):
+        """Letterbox a BGR or BGRA crop to the model size and return (CHW RGB image, crop shape).
+
+        The result never shares memory with the crop, so the frame can be reused right away.
+        """
+        im = letterbox(to_bgr(crop), self.imgsz, auto=False)[0]
+        im = np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+        return im, crop.shape[:2]
+
+    @smart_inference_mode()
+    def infer(self, images, shapes):
+        """Run preprocessed images through the model in one batch.
+
+        Returns one (n, 6) numpy array of xyxy, conf, cls per image, in crop coordinates.
+        """
+        if not self.dynamic_batch and len(images) > 1:
+            return [det for im, shape in zip(images, shapes) for det in self.infer([im], [shape])]
+
+        im = torch.from_numpy(np.stack(images)).to(self.device)
+        im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
+        im /= 255  # 0 - 255 to 0.0 - 1.0
+        pred = self.model(im)
+        pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, max_det=self.max_det)
+
+        results = []
+        for det, shape in zip(pred, shapes):
+            if len(det):
+                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape).round()
+            results.append(det.cpu().numpy())
+        return results
+
+    def classify(self, crop):
+        """Classify a single crop synchronously."""
+        im, shape = self.preprocess(crop)
+        return self.infer([im], [shape])[0]
+
+    def describe(self, det):
+        """Return a short 'name conf' summary of the detections, highest confidence first."""
+        order = np.argsort(-det[:, 4]) if len(det) else []
+        return ', '.join(f"{self.names[int(det[j, 5])]} {det[j, 4]:.2f}" for j in order) or 'nothing'
+
+
+class ClassifierWorker:
+    """Run a WasteClassifier on background threads for crops submitted by motion events.
+
+    `submit` letterboxes the crop on the calling thread and queues the small
+    result. Each worker thread takes everything queued (up to max_batch, across
+    all submitters, e.g. several cameras) and runs it in one forward call, then
+    passes each result to its `callback(key, det)`. When the queue is full the
+    oldest crop is dropped. A dropped crop, or a batch whose inference fails,
+    gets `callback(key, None)` so its event still completes. Nothing runs while
+    no bin is moving.
+    """
+
+    def __init__(self, classifier, callback=None, max_queue=32, max_batch=8, workers=1):
+        self.classifier = classifier
+        self.callback = callback
+        self.max_batch = max_batch
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.inferred = 0
+        self._pending = 0  # submitted crops whose callback has not returned yet
+        self._queue = deque(maxlen=max_queue)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f'classifier-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, crop, callback=None):
+        """Queue a crop for classification, the result goes to `callback` or the worker's default."""
+        im, shape = self.classifier.preprocess(crop)
+        evicted = None
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                evicted = self._queue.popleft()
+                self.dropped += 1
+            self._queue.append((key, im, shape, callback or self.callback))
+            self.submitted += 1
+            self._pending += 1
+            self._cond.notify_all()
+        if evicted is not None:
+            self._report(evicted[0], None, evicted[3])
+
+    def _report(self, key, det, callback):
+        try:
+            if callback is not None:
+                callback(key, det)
+        except Exception as e:
+            LOGGER.warning(f"Classification callback failed: {e}")
+        finally:
+            with self._cond:
+                self._pending -= 1
+                if not self._pending:
+                    self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every crop submitted so far has been reported, returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+            keys, images, shapes, callbacks = zip(*batch)
+            try:
+                results = self.classifier.infer(list(images), list(shapes))
+            except Exception as e:
+                LOGGER.warning(f"Classification of {len(batch)} crops failed: {e}")
+                results = [None] * len(batch)
+                with self._cond:
+                    self.failed += len(batch)
+            else:
+                with self._cond:
+                    self.batches += 1
+                    self.inferred += len(batch)
+            for key, det, callback in zip(keys, results, callbacks):
+                self._report(key, det, callback)
+
+    def close(self, timeout=10.0):
+        """Finish the queued crops and stop the threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "tests"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+pytest.importorskip("requests")
+pytest.importorskip("google.oauth2.credentials")
+
+from fake_sdm import PROJECT_ID, FakeSdm, write_token_file  # noqa: E402
+from sdm_session import SdmSession  # noqa: E402
+
+
+@pytest.fixture
+def fake_sdm():
+    with FakeSdm() as server:
+        yield server
+
+
+@pytest.fixture
+def session(tmp_path, fake_sdm):
+    """SdmSession against the fake server, with a cached refresh token so no browser flow runs."""
+    token_file = tmp_path / "token.json"
+    write_token_file(token_file, fake_sdm)
+    return SdmSession(PROJECT_ID, client_secrets=str(tmp_path / "credentials.json"), token_file=str(token_file),
+                      device_cache=str(tmp_path / "device_cache.json"), api_url=fake_sdm.api_url,
+                      token_uri=fake_sdm.token_uri)
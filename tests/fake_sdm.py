@@ -0,0 +1,221 @@
+"""
+Local stand-in for the Smart Device Management API, its OAuth token endpoint and the clip preview host.
+
+Point a session at it with SdmSession(api_url=server.api_url, token_uri=server.token_uri) or the SDM_API_URL and
+SDM_TOKEN_URI environment variables. It can also be run on its own to try the scripts without a camera:
+
+    $ python tests/fake_sdm.py --port 8765
+    $ SDM_API_URL=http://127.0.0.1:8765/v1 SDM_TOKEN_URI=http://127.0.0.1:8765/token python clip_fetcher.py
+"""
+
+import argparse
+import json
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ID = "fake-project"
+CAMERA = f"enterprises/{PROJECT_ID}/devices/camera-1"
+
+
+def rfc3339(dt):
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+
+class FakeSdm:
+    """Serves a project with one camera, its events and their clips from a background thread.
+
+    Every request is recorded in `requests` as (method, path, headers, body). Set `reject_tokens` to answer that
+    many API calls with 401, `broken_extensions` to answer that many Extend commands with an unparseable expiry, and
+    `stream_lifetime` to the seconds a generated or extended stream stays valid.
+    """
+
+    def __init__(self, events=None, clip=b"fake mp4 " * 1000, stream_lifetime=300.0):
+        now = datetime.now(timezone.utc)
+        if events is None:
+            events = [{"eventId": f"event-{i}", "timestamp": rfc3339(now - timedelta(minutes=10 - i)),
+                       "type": "motion"} for i in range(2)]
+        self.events = events
+        self.clips = {e["eventId"]: clip + e["eventId"].encode() for e in events}
+        self.stream_lifetime = stream_lifetime
+        self.reject_tokens = 0
+        self.broken_extensions = 0
+        self.tokens_issued = 0
+        self.token = None
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-sdm", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def api_url(self):
+        return f"{self.url}/v1"
+
+    @property
+    def token_uri(self):
+        return f"{self.url}/token"
+
+    def commands(self, name=None):
+        """Names of the device commands received so far, or the bodies of those named `name`."""
+        bodies = [body for method, path, _, body in self.requests if path.endswith(":executeCommand")]
+        if name is None:
+            return [b["command"].rsplit(".", 1)[-1] for b in bodies]
+        return [b for b in bodies if b["command"].endswith(name)]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Responses
+    def device(self):
+        traits = {"sdm.devices.traits.CameraMotion": {"events": {}}, "sdm.devices.traits.CameraPerson": {"events": {}}}
+        for e in self.events:
+            trait = "sdm.devices.traits.CameraPerson" if e["type"] == "person" else "sdm.devices.traits.CameraMotion"
+            traits[trait]["events"][e["eventId"]] = {"eventId": e["eventId"], "timestamp": e["timestamp"]}
+        return {"name": CAMERA, "type": "sdm.devices.types.CAMERA", "traits": traits}
+
+    def expires_at(self):
+        return rfc3339(datetime.now(timezone.utc) + timedelta(seconds=self.stream_lifetime))
+
+    def execute(self, command, params):
+        name = command.rsplit(".", 1)[-1]
+        if name in ("ExtendWebRtcStream", "ExtendRtspStream"):
+            with self._lock:
+                broken, self.broken_extensions = self.broken_extensions > 0, max(self.broken_extensions - 1, 0)
+            if broken:
+                return {"expiresAt": "never"}
+        if name == "GenerateWebRtcStream":
+            return {"answerSdp": "v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\n", "expiresAt": self.expires_at(),
+                    "mediaSessionId": "media-session-1"}
+        if name == "ExtendWebRtcStream":
+            return {"expiresAt": self.expires_at(), "mediaSessionId": params["mediaSessionId"]}
+        if name == "GenerateRtspStream":
+            return {"streamUrls": {"rtspUrl": "rtsps://127.0.0.1/stream?auth=token-1"}, "streamToken": "token-1",
+                    "streamExtensionToken": "extension-1", "expiresAt": self.expires_at()}
+        if name == "ExtendRtspStream":
+            n = int(params["streamExtensionToken"].rsplit("-", 1)[-1]) + 1
+            return {"streamToken": f"token-{n}", "streamExtensionToken": f"extension-{n}",
+                    "expiresAt": self.expires_at()}
+        if name in ("StopWebRtcStream", "StopRtspStream"):
+            return {}
+        if name == "GenerateClipPreview":
+            if params.get("eventId") not in self.clips:
+                raise KeyError(params.get("eventId"))
+            return {"previewClipUrl": f"{self.url}/clips/{params['eventId']}.mp4"}
+        raise KeyError(name)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="application/json", headers=None):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    return json.loads(data or b"{}")
+                return data.decode()
+
+            def _authorized(self):
+                with fake._lock:
+                    if fake.reject_tokens > 0:
+                        fake.reject_tokens -= 1
+                        return False
+                return self.headers.get("Authorization") == f"Bearer {fake.token}"
+
+            def do_POST(self):
+                body = self._body()
+                fake.requests.append(("POST", self.path, dict(self.headers), body))
+                if self.path == "/token":
+                    with fake._lock:
+                        fake.tokens_issued += 1
+                        fake.token = f"access-{fake.tokens_issued}"
+                    return self._send(200, {"access_token": fake.token, "expires_in": 3600, "token_type": "Bearer"})
+                m = re.fullmatch(r"/v1/(.+):executeCommand", self.path)
+                if not m:
+                    return self._send(404, {"error": "not found"})
+                if not self._authorized():
+                    return self._send(401, {"error": {"code": 401, "status": "UNAUTHENTICATED"}})
+                try:
+                    return self._send(200, {"results": fake.execute(body["command"], body.get("params", {}))})
+                except KeyError as e:
+                    return self._send(400, {"error": {"code": 400, "message": f"unknown {e}"}})
+
+            def do_GET(self):
+                fake.requests.append(("GET", self.path, dict(self.headers), None))
+                m = re.fullmatch(r"/clips/(.+)\.mp4", self.path)
+                if m:
+                    return self._clip(m.group(1))
+                if not self.path.startswith("/v1/"):
+                    return self._send(404, {"error": "not found"})
+                if not self._authorized():
+                    return self._send(401, {"error": {"code": 401, "status": "UNAUTHENTICATED"}})
+                if self.path == f"/v1/enterprises/{PROJECT_ID}/devices":
+                    return self._send(200, {"devices": [fake.device()]})
+                if self.path == f"/v1/{CAMERA}":
+                    return self._send(200, fake.device())
+                return self._send(404, {"error": "not found"})
+
+            def _clip(self, event_id):
+                if self.headers.get("Authorization") != f"Bearer {fake.token}":
+                    return self._send(401, {"error": "unauthenticated"})
+                data = fake.clips.get(event_id)
+                if data is None:
+                    return self._send(404, {"error": "not found"})
+                m = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if not m:
+                    return self._send(200, data, "video/mp4")
+                start = int(m.group(1))
+                if start >= len(data):
+                    return self._send(416, b"", "video/mp4", {"Content-Range": f"bytes */{len(data)}"})
+                return self._send(206, data[start:], "video/mp4",
+                                  {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"})
+
+        return Handler
+
+
+def write_token_file(path, server):
+    """Authorized-user token file with a refresh token, so sessions refresh against the fake token endpoint."""
+    with open(path, "w") as f:
+        json.dump({"refresh_token": "refresh-1", "client_id": "client-1", "client_secret": "secret-1",
+                   "token_uri": server.token_uri}, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    opt = parser.parse_args()
+    fake = FakeSdm()
+    fake.server.server_close()
+    fake.server = ThreadingHTTPServer(("127.0.0.1", opt.port), fake._handler())
+    write_token_file("token.json", fake)
+    print(f"Fake SDM API at {fake.api_url} (project {PROJECT_ID}), token endpoint {fake.token_uri}, "
+          f"token.json written")
+    fake.server.serve_forever()
@@ -0,0 +1,102 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from clip_fetcher import ClipFetcher, download_file
+from fake_sdm import CAMERA
+from sdm_session import SdmSession
+
+
+class StubResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        assert self.status_code < 400
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class StubHttp:
+    """Stands in for requests.Session, serving one clip and honouring Range headers."""
+
+    def __init__(self, clip):
+        self.clip = clip
+        self.calls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url, headers, kwargs))
+        start = int(headers["Range"][len("bytes="):-1]) if "Range" in headers else 0
+        return StubResponse(206 if start else 200, self.clip[start:])
+
+
+class StubCredentials:
+    token = "stub-token"
+    refresh_token = None
+    expiry = datetime.utcnow() + timedelta(days=1)
+
+
+def stub_session(tmp_path, clip):
+    session = SdmSession("stub-project", token_file=str(tmp_path / "token.json"))
+    session._creds = StubCredentials()
+    session.http = StubHttp(clip)
+    return session
+
+
+def test_download_file_through_session(tmp_path):
+    clip = os.urandom(10_000)
+    session = stub_session(tmp_path, clip)
+    path = tmp_path / "clip.mp4"
+    assert download_file(session, "https://example.com/clip.mp4", str(path), chunk_size=1024) == len(clip)
+    assert path.read_bytes() == clip
+    assert not os.path.exists(f"{path}.part")
+    method, url, headers, kwargs = session.http.calls[0]
+    assert headers == {"Authorization": "Bearer stub-token"}
+    assert kwargs["stream"]
+
+
+def test_download_file_resumes_partial(tmp_path):
+    clip = os.urandom(10_000)
+    session = stub_session(tmp_path, clip)
+    path = tmp_path / "clip.mp4"
+    with open(f"{path}.part", "wb") as f:
+        f.write(clip[:4000])
+    assert download_file(session, "https://example.com/clip.mp4", str(path)) == 6000
+    assert path.read_bytes() == clip
+    assert session.http.calls[0][2] == {"Range": "bytes=4000-", "Authorization": "Bearer stub-token"}
+
+
+def test_fetch_new_against_fake_server(session, fake_sdm, tmp_path):
+    output = tmp_path / "clips"
+    fetcher = ClipFetcher(session, CAMERA, str(output), workers=2)
+    clips = fetcher.fetch_new()
+    assert len(clips) == 2
+    for event, path in clips:
+        with open(path, "rb") as f:
+            assert f.read() == fake_sdm.clips[event["eventId"]]
+    with open(output / "fetch_state.json") as f:
+        assert json.load(f)["cursor"] == fake_sdm.events[-1]["timestamp"]
+
+    assert ClipFetcher(session, CAMERA, str(output)).fetch_new() == []  # nothing new after a restart
+
+
+def test_fetch_resumes_partial_clip_from_fake_server(session, fake_sdm, tmp_path):
+    fetcher = ClipFetcher(session, CAMERA, str(tmp_path))
+    event = fake_sdm.events[0]
+    path = fetcher.clip_path(event)
+    data = fake_sdm.clips[event["eventId"]]
+    with open(f"{path}.part", "wb") as f:
+        f.write(data[:100])
+    assert fetcher.fetch(event) == path
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert [r[2].get("Range") for r in fake_sdm.requests if r[1].startswith("/clips/")] == ["bytes=100-"]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from clip_fetcher import ClipFetcher  # noqa: E402
+from event_ingest import EventDispatcher, EventSubscriber, FileSubscriber, parse_event_message  # noqa: E402
+from fake_sdm import CAMERA  # noqa: E402
+
+
+def event_message(event_id, timestamp=None, device=CAMERA):
+    message = {"eventId": f"message-{event_id}", "resourceUpdate": {"name": device, "events": {
+        "sdm.devices.events.CameraMotion.Motion": {"eventSessionId": "session-1", "eventId": event_id}}}}
+    if timestamp is not None:
+        message["timestamp"] = timestamp
+    return json.dumps(message)
+
+
+def test_message_without_timestamp_is_stamped():
+    event, = parse_event_message(event_message("event-0"))
+    assert event["timestamp"].endswith("Z")
+    assert parse_event_message(json.dumps({"resourceUpdate": {"name": CAMERA, "traits": {}}})) == []
+
+
+def test_subscriber_is_abstract():
+    with pytest.raises(TypeError):
+        EventSubscriber()
+
+
+def test_file_messages_fetched_end_to_end(session, fake_sdm, tmp_path):
+    events = fake_sdm.events
+    messages = tmp_path / "events.jsonl"
+    messages.write_text("\n".join([
+        event_message(events[0]["eventId"], events[0]["timestamp"]),
+        event_message(events[1]["eventId"]),  # no top-level timestamp
+        event_message(events[0]["eventId"], events[0]["timestamp"]),  # duplicate delivery
+        event_message("other", device="enterprises/other/devices/camera"),
+        "not json"]) + "\n")
+
+    fetcher = ClipFetcher(session, CAMERA, str(tmp_path / "clips"))
+    dispatcher = EventDispatcher(fetcher, workers=2)
+    FileSubscriber(str(messages), follow=False).run(dispatcher)
+    dispatcher.close()
+
+    assert dispatcher.received == 3
+    assert dispatcher.failed == 0
+    assert sorted(fetcher.fetched) == ["event-0", "event-1"]
+    assert len([r for r in fake_sdm.requests if r[1].startswith("/clips/")]) == 2
+    fetched = sorted(fetcher.fetched.items(), key=lambda item: item[1])
+    fetcher._advance([{"eventId": e, "timestamp": t} for e, t in fetched], set(fetcher.fetched))
+    assert fetcher.cursor == fetched[-1][1]
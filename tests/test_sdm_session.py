@@ -0,0 +1,74 @@
+import json
+import time
+
+from fake_sdm import CAMERA
+from sdm_session import StreamKeeper
+
+
+def test_token_refreshed_and_cached(session, fake_sdm, tmp_path):
+    assert session.camera_device_id() == CAMERA
+    assert fake_sdm.tokens_issued == 1
+    with open(tmp_path / "token.json") as f:
+        assert json.load(f)["token"] == fake_sdm.token
+
+    session.devices(refresh=True)  # token still valid, no new refresh
+    assert fake_sdm.tokens_issued == 1
+
+
+def test_device_list_cached(session, fake_sdm):
+    session.devices()
+    listed = len([r for r in fake_sdm.requests if r[1].endswith("/devices")])
+    session._devices = None
+    assert session.camera_device_id() == CAMERA  # read back from device_cache.json
+    assert len([r for r in fake_sdm.requests if r[1].endswith("/devices")]) == listed
+
+
+def test_retry_with_fresh_token_on_401(session, fake_sdm):
+    session.devices()
+    fake_sdm.reject_tokens = 1
+    response = session.get(CAMERA)
+    assert response.status_code == 200
+    assert fake_sdm.tokens_issued == 2
+
+
+def test_webrtc_stream_generate_extend_stop(session, fake_sdm):
+    lease = session.generate_webrtc_stream(CAMERA, "v=0")
+    assert lease.results["answerSdp"].startswith("v=0")
+    assert lease.params == {"mediaSessionId": "media-session-1"}
+    first = lease.expires_at
+    time.sleep(0.01)
+    session.extend_stream(CAMERA, lease)
+    assert lease.expires_at > first
+    session.stop_stream(CAMERA, lease)
+    assert fake_sdm.commands() == ["GenerateWebRtcStream", "ExtendWebRtcStream", "StopWebRtcStream"]
+    assert fake_sdm.commands("StopWebRtcStream")[0]["params"] == {"mediaSessionId": "media-session-1"}
+
+
+def test_rtsp_stream_extension_token_rotates(session, fake_sdm):
+    lease = session.generate_rtsp_stream(CAMERA)
+    assert lease.params == {"streamExtensionToken": "extension-1"}
+    session.extend_stream(CAMERA, lease)
+    assert lease.params == {"streamExtensionToken": "extension-2"}
+    assert lease.results["streamToken"] == "token-2"
+
+
+def test_stream_keeper_extends_before_expiry(session, fake_sdm):
+    fake_sdm.stream_lifetime = 1.0
+    lease = session.generate_webrtc_stream(CAMERA, "v=0")
+    keeper = StreamKeeper(session, CAMERA, lease, margin=0.8, retry_delay=0.05).start()
+    time.sleep(0.6)
+    keeper.stop()
+    assert keeper.extensions >= 1
+    assert fake_sdm.commands()[-1] == "StopWebRtcStream"
+
+
+def test_stream_keeper_retries_after_unexpected_error(session, fake_sdm):
+    fake_sdm.stream_lifetime = 1.0
+    fake_sdm.broken_extensions = 1  # first extension fails outside requests
+    lease = session.generate_webrtc_stream(CAMERA, "v=0")
+    keeper = StreamKeeper(session, CAMERA, lease, margin=0.8, retry_delay=0.05).start()
+    time.sleep(0.6)
+    assert keeper._thread.is_alive()
+    keeper.stop()
+    assert keeper.extensions >= 1
+    assert fake_sdm.commands().count("ExtendWebRtcStream") >= 2
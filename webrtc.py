@@ -1,9 +1,10 @@
 import os
 import requests
-import google.auth
-from google_auth_oauthlib.flow import InstalledAppFlow
 from dotenv import load_dotenv
 
+from clip_fetcher import download_file
+from sdm_session import SdmSession
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -12,27 +13,8 @@ PROJECT_ID = os.getenv("PROJECT_ID")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 
-# Scopes for the OAuth2
-SCOPES = ["https://www.googleapis.com/auth/sdm.service"]
-
-def get_credentials():
-    flow = InstalledAppFlow.from_client_secrets_file(
-        'credentials.json', SCOPES)
-    creds = flow.run_local_server(port=8080)
-    return creds
-
-def get_device_id(creds):
-    url = f"https://smartdevicemanagement.googleapis.com/v1/enterprises/{PROJECT_ID}/devices"
-    response = requests.get(url, headers={"Authorization": f"Bearer {creds.token}"})
-    devices = response.json().get("devices", [])
-    for device in devices:
-        if "sdm.devices.types.CAMERA" in device.get("type", ""):
-            return device["name"]  # Return the device ID for the camera
-    return None
-
-def get_latest_event_id(creds, device_id):
-    url = f"https://smartdevicemanagement.googleapis.com/v1/{device_id}"
-    response = requests.get(url, headers={"Authorization": f"Bearer {creds.token}"})
+def get_latest_event_id(session, device_id):
+    response = session.get(device_id)
     traits = response.json().get("traits", {})
     
     # Check for motion events first
@@ -50,8 +32,7 @@ def get_latest_event_id(creds, device_id):
     print("No events found.")
     return None
 
-def generate_clip_preview(creds, device_id, event_id):
-    url = f"https://smartdevicemanagement.googleapis.com/v1/{device_id}:executeCommand"
+def generate_clip_preview(session, device_id, event_id):
     body = {
         "command": "sdm.devices.commands.CameraClipPreview.GenerateClipPreview",
         "params": {
@@ -59,36 +40,36 @@ def generate_clip_preview(creds, device_id, event_id):
         }
     }
 
-    response = requests.post(url, headers={"Authorization": f"Bearer {creds.token}"}, json=body)
+    response = session.request("POST", f"{device_id}:executeCommand", json=body)
     if response.status_code == 200:
         return response.json().get("results", {}).get("previewClipUrl")
     else:
         print(f"Failed to generate clip preview: {response.status_code}, {response.text}")
         return None
 
-def download_clip(url, filename):
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(filename, "wb") as f:
-            f.write(response.content)
+def download_clip(session, url, filename):
+    # Streamed to disk in chunks, resuming a partial download
+    try:
+        download_file(session, url, filename)
         print(f"Video clip saved as {filename}")
-    else:
-        print(f"Failed to download video clip: {response.status_code}, {response.text}")
+    except requests.RequestException as e:
+        print(f"Failed to download video clip: {e}")
 
 def main():
-    creds = get_credentials()
-    device_id = get_device_id(creds)
+    # Tokens and the device list are cached between runs
+    session = SdmSession(PROJECT_ID)
+    device_id = session.camera_device_id()
     if device_id:
         print("Retrieving the latest event ID...")
-        event_id = get_latest_event_id(creds, device_id)
+        event_id = get_latest_event_id(session, device_id)
 
         if event_id:
             print(f"Generating clip preview for event ID: {event_id}")
-            clip_url = generate_clip_preview(creds, device_id, event_id)
+            clip_url = generate_clip_preview(session, device_id, event_id)
 
             if clip_url:
                 print("Downloading video clip...")
-                download_clip(clip_url, "latest_event_clip.mp4")
+                download_clip(session, clip_url, "latest_event_clip.mp4")
             else:
                 print("Failed to retrieve clip URL.")
         else:
@@ -1,13 +1,27 @@
-import requests
-import google.auth
-from google_auth_oauthlib.flow import InstalledAppFlow
 import json
 import asyncio
 from aiortc import RTCPeerConnection, MediaStreamTrack, RTCSessionDescription
 from aiortc.contrib.signaling import BYE
 import os
+import sys
+import time
+from pathlib import Path
 from dotenv import load_dotenv
+import requests
 import av
+from aiortc.mediastreams import MediaStreamError
+import cv2
+import numpy as np
+
+# Make the livestream motion pipeline importable
+LIVESTREAM = Path(__file__).resolve().parent / 'src_livestream'
+if str(LIVESTREAM) not in sys.path:
+    sys.path.append(str(LIVESTREAM))
+
+from bin_layout import DEFAULT_LAYOUT, load_layout
+from bin_monitor import BinMonitor
+from pipeline import FramePool
+from sdm_session import SdmSession, StreamKeeper
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,15 +31,6 @@ PROJECT_ID = os.getenv("PROJECT_ID")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 
-# Scopes for the OAuth2
-SCOPES = ["https://www.googleapis.com/auth/sdm.service"]
-
-def get_credentials():
-    flow = InstalledAppFlow.from_client_secrets_file(
-        'credentials.json', SCOPES)
-    creds = flow.run_local_server(port=8080)
-    return creds
-
 class DummyAudioTrack(MediaStreamTrack):
     kind = "audio"
 
@@ -44,13 +49,7 @@ class DummyVideoTrack(MediaStreamTrack):
         frame.time_base = self.time_base
         return frame
 
-async def create_offer_sdp():
-    pc = RTCPeerConnection()
-
-    @pc.on("signalingstatechange")
-    async def on_signalingstatechange():
-        print(f"Signaling state changed: {pc.signalingState}")
-
+async def create_offer_sdp(pc):
     # Add dummy audio and video tracks
     audio_track = DummyAudioTrack()
     video_track = DummyVideoTrack()
@@ -73,31 +72,108 @@ async def create_offer_sdp():
     # Return the SDP as a string
     return sdp
 
-def get_device_id(creds):
-    url = f"https://smartdevicemanagement.googleapis.com/v1/enterprises/{PROJECT_ID}/devices"
-    response = requests.get(url, headers={"Authorization": f"Bearer {creds.token}"})
-    devices = response.json().get("devices", [])
-    for device in devices:
-        if "sdm.devices.types.CAMERA" in device.get("type", ""):
-            return device["name"]  # Return the device ID for the camera
-
-def generate_webrtc_offer(creds, device_id):
-    url = f"https://smartdevicemanagement.googleapis.com/v1/{device_id}:executeCommand"
-
-    # Generate the SDP offer
-    offer_sdp = asyncio.run(create_offer_sdp())
-
-    body = {
-        "command": "sdm.devices.commands.CameraLiveStream.GenerateWebRtcStream",
-        "params": {
-            "offerSdp": offer_sdp
-        }
-    }
-    response = requests.post(url, headers={"Authorization": f"Bearer {creds.token}"}, json=body)
-    return response.json()
-
-async def start_webrtc_stream(answer_sdp):
+def generate_webrtc_offer(session, device_id, offer_sdp):
+    """Send the offer to the camera, returns a StreamLease holding the answer SDP and expiry."""
+    return session.generate_webrtc_stream(device_id, offer_sdp)
+
+class VideoFrameReceiver:
+    """Pull av.VideoFrames from the remote video track into reused numpy BGR buffers.
+
+    Converted frames go through a bounded asyncio queue to `consume`, which runs
+    the bin monitor on a worker thread. When the queue is full the oldest frame
+    is dropped, so a slow detector never delays the WebRTC receive loop.
+    """
+
+    def __init__(self, maxsize=4):
+        self.queue = asyncio.Queue(maxsize)
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.finished = asyncio.Event()
+        self._pool = None
+        self._yuv = None
+
+    def _buffers(self, width, height):
+        # Reallocate only when the stream resolution changes
+        shape = (height, width, 3)
+        if self._pool is None or self._pool.frames[0].shape != shape:
+            self._pool = FramePool(self.queue.maxsize + 2, shape)
+            self._yuv = np.empty((height * 3 // 2, width), np.uint8)
+        return self._pool
+
+    def _convert(self, frame, out):
+        """Convert a decoded frame into `out` without allocating a new image."""
+        w, h = frame.width, frame.height
+        if frame.format.name != 'yuv420p' or w % 2 or h % 2:
+            np.copyto(out, frame.to_ndarray(format='bgr24'))
+            return
+
+        # Pack the padded Y, U and V planes into one I420 buffer, then convert to BGR in place
+        flat = self._yuv.reshape(-1)
+        y, u, v = frame.planes
+        self._yuv[:h] = np.frombuffer(y, np.uint8).reshape(-1, y.line_size)[:h, :w]
+        quarter = (h // 2) * (w // 2)
+        flat[h * w:h * w + quarter].reshape(h // 2, w // 2)[:] = \
+            np.frombuffer(u, np.uint8).reshape(-1, u.line_size)[:h // 2, :w // 2]
+        flat[h * w + quarter:].reshape(h // 2, w // 2)[:] = \
+            np.frombuffer(v, np.uint8).reshape(-1, v.line_size)[:h // 2, :w // 2]
+        cv2.cvtColor(self._yuv, cv2.COLOR_YUV2BGR_I420, dst=out)
+
+    def _put(self, item):
+        # Drop the oldest queued frame when the consumer falls behind
+        if self.queue.full():
+            old = self.queue.get_nowait()
+            if old is not None:
+                old[0].release(old[1])
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    async def receive(self, track):
+        try:
+            while True:
+                try:
+                    frame = await track.recv()
+                except MediaStreamError:
+                    break
+                self.received += 1
+                pool = self._buffers(frame.width, frame.height)
+                index = pool.acquire()
+                if index is None:
+                    self.dropped += 1
+                    continue
+                self._convert(frame, pool.frames[index])
+                timestamp = float(frame.time) if frame.time is not None else time.time()
+                self._put((pool, index, timestamp))
+        finally:
+            self._put(None)
+
+    async def consume(self, monitor):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                pool, index, timestamp = item
+                try:
+                    await loop.run_in_executor(None, monitor.process, pool.frames[index], timestamp)
+                finally:
+                    pool.release(index)
+                self.processed += 1
+        finally:
+            monitor.flush()
+            self.finished.set()
+
+async def start_webrtc_stream(session, device_id, monitor, duration=None):
+    """Open a WebRTC stream of the camera and feed its video frames to the bin monitor.
+
+    Runs until the remote track ends, or for `duration` seconds if given. The
+    stream is extended shortly before each expiry, so it outlives the 5 minute
+    lifetime of a single GenerateWebRtcStream.
+    """
     pc = RTCPeerConnection()
+    receiver = VideoFrameReceiver()
+    tasks = []
 
     @pc.on("signalingstatechange")
     async def on_signalingstatechange():
@@ -120,12 +196,28 @@ async def start_webrtc_stream(answer_sdp):
     def on_track(track):
         print(f"Track {track.kind} received")
         if track.kind == "video":
-            local_track = DummyVideoTrack()  # Assuming DummyVideoTrack is correctly implemented
-            pc.addTrack(local_track)
+            tasks.append(asyncio.ensure_future(receiver.receive(track)))
+            tasks.append(asyncio.ensure_future(receiver.consume(monitor)))
         elif track.kind == "audio":
             # If you do not want to handle audio, you can simply not add any audio tracks
             print("Ignoring audio track")
 
+    # Create the offer on this connection and ask the camera for its answer
+    offer_sdp = await create_offer_sdp(pc)
+    loop = asyncio.get_running_loop()
+    try:
+        lease = await loop.run_in_executor(None, generate_webrtc_offer, session, device_id, offer_sdp)
+    except (requests.RequestException, KeyError) as e:
+        print(f"Failed to receive WebRTC answer: {e}")
+        await pc.close()
+        return None
+    answer_sdp = lease.results.get('answerSdp')
+    if not answer_sdp:
+        print("Failed to receive WebRTC answer: no answerSdp in the response")
+        await loop.run_in_executor(None, session.stop_stream, device_id, lease)
+        await pc.close()
+        return None
+
     # Clean the answer SDP (if necessary)
     cleaned_sdp = clean_sdp(answer_sdp)
 
@@ -140,15 +232,28 @@ async def start_webrtc_stream(answer_sdp):
             print(f"Cannot set remote description in signaling state: {pc.signalingState}")
     except ValueError as e:
         print(f"Error setting remote description: {e}")
+        await loop.run_in_executor(None, session.stop_stream, device_id, lease)
+        await pc.close()
         raise
+    keeper = StreamKeeper(session, device_id, lease).start()
 
-    # Keep the connection alive until manually closed or a timeout occurs
+    # Keep the connection alive until the video track ends or the duration is up
     try:
-        await asyncio.sleep(10)  # You can increase this to keep the stream alive longer
-    except asyncio.CancelledError:
-        pass  # Handle the case where the sleep is cancelled
-
-    return pc.localDescription
+        await asyncio.wait_for(receiver.finished.wait(), duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await loop.run_in_executor(None, keeper.stop)
+        await pc.close()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        print(f"Received {receiver.received} frames, processed {receiver.processed}, dropped {receiver.dropped}, "
+              f"stream extended {keeper.extensions} times")
+        # Surface failures of the receive and consume tasks (e.g. frames that do not fit the layout)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    return lease
 
 def clean_sdp(sdp):
     """ Clean or adjust the SDP to be compatible with aiortc """
@@ -167,17 +272,14 @@ def clean_sdp(sdp):
     return "\n".join(cleaned_lines)
 
 def main():
-    creds = get_credentials()
-    device_id = get_device_id(creds)
+    # Tokens and the device list are cached between runs
+    session = SdmSession(PROJECT_ID)
+    device_id = session.camera_device_id()
     if device_id:
-        stream_info = generate_webrtc_offer(creds, device_id)
-
-        # Retrieve the answer SDP from the API response
-        answer_sdp = stream_info.get('results', {}).get('answerSdp', {})
-        if answer_sdp:
-            asyncio.run(start_webrtc_stream(answer_sdp))
-        else:
-            print("Failed to receive WebRTC answer.")
+        # Bins of the camera profile matching the native stream resolution
+        profile = load_layout(os.getenv('BIN_LAYOUT') or DEFAULT_LAYOUT)[os.getenv('BIN_CAMERA', 'recorded')]
+        monitor = BinMonitor.from_profile(profile)
+        asyncio.run(start_webrtc_stream(session, device_id, monitor))
     else:
         print("No camera device found.")
 
@@ -1,20 +1,25 @@
 # Ultralytics YOLOv5 🚀, AGPL-3.0 license
 """Dataloaders and dataset utils."""
 
+import atexit
 import contextlib
+import copy
 import glob
 import hashlib
+import io
 import json
 import math
 import os
 import random
 import shutil
+import tarfile
 import time
-from itertools import repeat
+import urllib.request
+from itertools import islice, repeat
 from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
 from threading import Thread
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 
 import numpy as np
 import psutil
@@ -23,7 +28,7 @@ import torch.nn.functional as F
 import torchvision
 import yaml
 from PIL import ExifTags, Image, ImageOps
-from torch.utils.data import DataLoader, Dataset, dataloader, distributed
+from torch.utils.data import DataLoader, Dataset, IterableDataset, dataloader, distributed
 from tqdm import tqdm
 
 from utils.augmentations import (
@@ -65,6 +70,9 @@ LOCAL_RANK = int(os.getenv("LOCAL_RANK", -1))  # https://pytorch.org/docs/stable
 RANK = int(os.getenv("RANK", -1))
 WORLD_SIZE = int(os.getenv("WORLD_SIZE", 1))
 PIN_MEMORY = str(os.getenv("PIN_MEMORY", True)).lower() == "true"  # global pin_memory for dataloaders
+LABEL_STORE = str(os.getenv("LABEL_STORE", False)).lower() == "true"  # read labels from a packed *.lbs store
+SHARD_INDEX = "index.json"  # index of a sharded dataset, see build_shards()
+RAM_CACHE_DIR = os.getenv("RAM_CACHE_DIR", "/dev/shm")  # shared --cache ram files, see ImageCache
 
 # Get orientation exif tag
 for orientation in ExifTags.TAGS.keys():
@@ -177,37 +185,57 @@ def create_dataloader(
     seed=0,
 ):
     """Creates and returns a configured DataLoader instance for loading and processing image datasets."""
+    sharded = shard_index(path) is not None  # tar shards written by build_shards(), streamed sequentially
+    if sharded and (rect or image_weights or cache):
+        LOGGER.warning("WARNING ⚠️ --rect, --image-weights and --cache are not supported for shards, ignoring")
+        rect = image_weights = False
     if rect and shuffle:
         LOGGER.warning("WARNING ⚠️ --rect is incompatible with DataLoader shuffle, setting shuffle=False")
         shuffle = False
     with torch_distributed_zero_first(rank):  # init dataset *.cache only once if DDP
-        dataset = LoadImagesAndLabels(
-            path,
-            imgsz,
-            batch_size,
-            augment=augment,  # augmentation
-            hyp=hyp,  # hyperparameters
-            rect=rect,  # rectangular batches
-            cache_images=cache,
-            single_cls=single_cls,
-            stride=int(stride),
-            pad=pad,
-            image_weights=image_weights,
-            prefix=prefix,
-            rank=rank,
-        )
+        if sharded:
+            dataset = LoadShards(
+                path,
+                imgsz,
+                batch_size,
+                augment=augment,
+                hyp=hyp,
+                single_cls=single_cls,
+                stride=int(stride),
+                pad=pad,
+                prefix=prefix,
+                rank=rank,
+                seed=seed,
+                shuffle=shuffle,  # shard order and shuffle buffer
+            )
+        else:
+            dataset = LoadImagesAndLabels(
+                path,
+                imgsz,
+                batch_size,
+                augment=augment,  # augmentation
+                hyp=hyp,  # hyperparameters
+                rect=rect,  # rectangular batches
+                cache_images=cache,
+                single_cls=single_cls,
+                stride=int(stride),
+                pad=pad,
+                image_weights=image_weights,
+                prefix=prefix,
+                rank=rank,
+            )
 
     batch_size = min(batch_size, len(dataset))
     nd = torch.cuda.device_count()  # number of CUDA devices
     nw = min([os.cpu_count() // max(nd, 1), batch_size if batch_size > 1 else 0, workers])  # number of workers
-    sampler = None if rank == -1 else SmartDistributedSampler(dataset, shuffle=shuffle)
-    loader = DataLoader if image_weights else InfiniteDataLoader  # only DataLoader allows for attribute updates
+    sampler = None if rank == -1 or sharded else SmartDistributedSampler(dataset, shuffle=shuffle)
+    loader = DataLoader if image_weights or sharded else InfiniteDataLoader  # DataLoader allows for attribute updates
     generator = torch.Generator()
     generator.manual_seed(6148914691236517205 + seed + RANK)
     return loader(
         dataset,
         batch_size=batch_size,
-        shuffle=shuffle and sampler is None,
+        shuffle=shuffle and sampler is None and not sharded,
         num_workers=nw,
         sampler=sampler,
         pin_memory=PIN_MEMORY,
@@ -534,10 +562,237 @@ def img2label_paths(img_paths):
     return [sb.join(x.rsplit(sa, 1)).rsplit(".", 1)[0] + ".txt" for x in img_paths]
 
 
+def read_label_file(lb_file):
+    """Parses a YOLO *.txt label file into (n, 5) cls-xywh rows and polygon segments, converting segments to boxes."""
+    with open(lb_file) as f:
+        return parse_labels(f.read())
+
+
+def parse_labels(text):
+    """Parses the text of a YOLO label file into (n, 5) cls-xywh rows and polygon segments."""
+    segments = []
+    lb = [x.split() for x in text.strip().splitlines() if len(x)]
+    if any(len(x) > 6 for x in lb):  # is segment
+        classes = np.array([x[0] for x in lb], dtype=np.float32)
+        segments = [np.array(x[1:], dtype=np.float32).reshape(-1, 2) for x in lb]  # (cls, xy1...)
+        lb = np.concatenate((classes.reshape(-1, 1), segments2boxes(segments)), 1)  # (cls, xywh)
+    lb = np.array(lb, dtype=np.float32)
+    return lb, segments
+
+
+def is_stream_url(path):
+    """Returns True if `path` is an http(s) URL, which is read as a stream instead of a local file."""
+    return urlparse(str(path)).scheme in ("http", "https")
+
+
+def shard_index(path):
+    """Returns the index of a sharded dataset at `path` (a shards directory, its index.json or an index URL), or
+    None.
+    """
+    if not isinstance(path, (str, Path)):
+        return None
+    path = str(path)
+    if path.endswith(SHARD_INDEX):
+        return path
+    index = os.path.join(path, SHARD_INDEX)
+    return index if os.path.isfile(index) else None
+
+
+class LabelStore:
+    """
+    Packs the labels of a whole dataset into one file: an offset index per label file and one array of all boxes.
+
+    Both arrays are memory-mapped, so opening the store costs a single `open` and looking up the labels of one
+    image is O(1) regardless of dataset size. Label files with polygons are left out so their segments are kept, and
+    files missing from the store or modified after it was built are read from the *.txt instead. Layout: 8-byte magic,
+    uint64 file count, box count and names length, newline-separated label paths relative to the store (padded
+    to 8 bytes), int64 offsets[n + 1], float32 boxes[m, 5].
+    """
+
+    magic = b"YOLOLBS2"
+
+    def __init__(self, path):
+        """Memory-maps an existing store."""
+        self.path = Path(path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "rb") as f:
+            header = f.read(32)
+            assert header[:8] == self.magic, f"{self.path} is not a label store"
+            n, m, names_len = np.frombuffer(header[8:], dtype=np.uint64).tolist()
+            names = f.read(names_len).decode().split("\n") if n else []
+        start = 32 + names_len + (-names_len % 8)
+        self.index = {name: i for i, name in enumerate(names)}
+        self.offsets = np.memmap(self.path, dtype=np.int64, mode="r", offset=start, shape=(n + 1,))
+        self.boxes = (
+            np.memmap(self.path, dtype=np.float32, mode="r", offset=start + 8 * (n + 1), shape=(m, 5))
+            if m
+            else np.zeros((0, 5), dtype=np.float32)
+        )
+
+    def __len__(self):
+        """Returns the number of label files in the store."""
+        return len(self.index)
+
+    def key(self, lb_file):
+        """Returns the store key of a label file path."""
+        return os.path.relpath(lb_file, self.path.parent)
+
+    def get(self, lb_file):
+        """Returns a read-only (n, 5) view of the labels of `lb_file`, or None if the file was not packed."""
+        i = self.index.get(self.key(lb_file))
+        return None if i is None else self.boxes[self.offsets[i] : self.offsets[i + 1]]
+
+    def current(self, lb_file, stat):
+        """Returns a copy of the labels of `lb_file` if the store holds them and the file has not changed since, else
+        None to read the file itself. `stat` is the (mtime_ns, size) of `lb_file`, None if it does not exist.
+        """
+        if stat is None or stat[0] > self.mtime:
+            return None
+        lb = self.get(lb_file)
+        return None if lb is None else np.array(lb)
+
+    @classmethod
+    def build(cls, label_files, path, prefix=""):
+        """Reads every existing label file once (in parallel) and writes them to a new store at `path`."""
+        path = Path(path)
+        label_files = [f for f in label_files if os.path.isfile(f)]
+        names, labels, polygons = [], [], 0
+        with ThreadPool(NUM_THREADS) as pool:
+            for f, result in zip(label_files, pool.imap(cls._read, label_files)):
+                if isinstance(result, str):
+                    LOGGER.warning(f"{prefix}WARNING ⚠️ {f}: not packed, {result}")
+                    continue
+                if result is None:
+                    polygons += 1
+                    continue
+                names.append(os.path.relpath(f, path.parent))
+                labels.append(result)
+        offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(x) for x in labels])
+        boxes = np.concatenate(labels, 0) if labels else np.zeros((0, 5), dtype=np.float32)
+        names = "\n".join(names).encode()
+
+        tmp = path.with_suffix(".lbs.tmp")
+        with open(tmp, "wb") as f:
+            f.write(cls.magic + np.array([len(labels), len(boxes), len(names)], dtype=np.uint64).tobytes())
+            f.write(names + b"\0" * (-len(names) % 8))
+            f.write(offsets.tobytes())
+            f.write(np.ascontiguousarray(boxes, dtype=np.float32).tobytes())
+        tmp.replace(path)
+        LOGGER.info(f"{prefix}Packed {len(labels)} label files with {len(boxes)} boxes into {path}")
+        if polygons:
+            LOGGER.info(f"{prefix}{polygons} label files with polygons not packed, read from their *.txt")
+        return cls(path)
+
+    @staticmethod
+    def _read(lb_file):
+        """Reads one label file as (n, 5) float32 rows, None if it has polygons, or returns an error message."""
+        try:
+            lb, segments = read_label_file(lb_file)
+            if segments:
+                return None
+            lb = lb.reshape(-1, 5) if lb.size else np.zeros((0, 5), dtype=np.float32)
+            return lb
+        except Exception as e:
+            return str(e)
+
+
+class ImageCache:
+    """
+    Holds the resized images of a dataset in one file that every DDP rank and dataloader worker maps read-only.
+
+    The file is written once (by local rank 0, the other ranks wait in create_dataloader) and shared through the page
+    cache, so the images take RAM once per host instead of once per process. Layout: 8-byte magic, uint64 image
+    count, int64 offsets[n + 1], int32 shapes[n, 5] (h0, w0, h, w, channels), image bytes from a 64-byte boundary.
+    """
+
+    magic = b"YOLOIMC1"
+
+    def __init__(self, path):
+        """Memory-maps an existing cache."""
+        self.path = Path(path)
+        self._map()
+
+    def _map(self):
+        """Maps the file once and views the offset table and shapes from it."""
+        self.data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        assert bytes(self.data[:8]) == self.magic, f"{self.path} is not an image cache"
+        n = int(self.data[8:16].view(np.uint64)[0])
+        self.offsets = self.data[16 : 16 + 8 * (n + 1)].view(np.int64)
+        self.shapes = self.data[16 + 8 * (n + 1) : 16 + 28 * n + 8].view(np.int32).reshape(n, 5)
+
+    def __len__(self):
+        """Returns the number of cached images."""
+        return len(self.shapes)
+
+    def __getstate__(self):
+        """Pickles the path only, so spawned workers map the file instead of receiving a copy."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        """Maps the file again in the unpickling process."""
+        self.path = state["path"]
+        self._map()
+
+    def remove_at_exit(self):
+        """Deletes the cache file when this process exits if it is local rank 0, returns self."""
+        if LOCAL_RANK in {-1, 0}:  # the other ranks may exit first, their mappings outlive the file anyway
+            pid = os.getpid()
+
+            def remove():
+                if os.getpid() == pid:  # not in forked dataloader workers
+                    self.path.unlink(missing_ok=True)
+
+            atexit.register(remove)
+        return self
+
+    @staticmethod
+    def building(tmp):
+        """Returns True if the process writing the temp file `tmp` (`*.ims.<pid>.tmp`) is still running."""
+        pid = tmp.name.rsplit(".", 2)[-2]
+        return pid.isdigit() and int(pid) != os.getpid() and psutil.pid_exists(int(pid))
+
+    def get(self, i):
+        """Returns a read-only view of image `i`, its original hw and its resized hw."""
+        h0, w0, h, w, c = self.shapes[i].tolist()
+        return self.data[self.offsets[i] : self.offsets[i + 1]].reshape(h, w, c), (h0, w0), (h, w)
+
+    @classmethod
+    def build(cls, path, n, load, prefix=""):
+        """Writes `load(i) -> (im, hw_original, hw_resized)` for i in range(n) to a new cache at `path`."""
+        path = Path(path)
+        offsets, shapes = np.zeros(n + 1, dtype=np.int64), np.zeros((n, 5), dtype=np.int32)
+        start = 16 + 8 * (n + 1) + 20 * n
+        start += -start % 64  # align the image data
+        gb = 1 << 30  # bytes per gigabytes
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f, ThreadPool(NUM_THREADS) as pool:
+                f.seek(start)
+                pos = start
+                pbar = tqdm(pool.imap(load, range(n)), total=n, bar_format=TQDM_BAR_FORMAT, disable=LOCAL_RANK > 0)
+                for i, (im, hw0, hw) in enumerate(pbar):
+                    im = np.ascontiguousarray(im)
+                    shapes[i] = (*hw0, *hw, im.shape[2] if im.ndim == 3 else 1)
+                    offsets[i] = pos
+                    f.write(im.data)
+                    pos += im.nbytes
+                    pbar.desc = f"{prefix}Caching images ({(pos - start) / gb:.1f}GB shared ram)"
+                pbar.close()
+                offsets[n] = pos
+                f.seek(0)
+                f.write(cls.magic + np.array([n], dtype=np.uint64).tobytes() + offsets.tobytes() + shapes.tobytes())
+        except BaseException:
+            tmp.unlink(missing_ok=True)  # do not leave a partial cache in RAM
+            raise
+        tmp.replace(path)
+        return cls(path)
+
+
 class LoadImagesAndLabels(Dataset):
     """Loads images and their corresponding labels for training and validation in YOLOv5."""
 
-    cache_version = 0.6  # dataset labels *.cache version
+    cache_version = 0.7  # dataset labels *.cache version
     rand_interp_methods = [cv2.INTER_NEAREST, cv2.INTER_LINEAR, cv2.INTER_CUBIC, cv2.INTER_AREA, cv2.INTER_LANCZOS4]
 
     def __init__(
@@ -594,10 +849,21 @@ class LoadImagesAndLabels(Dataset):
         # Check cache
         self.label_files = img2label_paths(self.im_files)  # labels
         cache_path = (p if p.is_file() else Path(self.label_files[0]).parent).with_suffix(".cache")
+        self.label_store = None
+        if LABEL_STORE:  # packed labels, built once from the *.txt files (delete the *.lbs file to rebuild)
+            # labels missing from the store or edited since it was built are still read from their *.txt
+            store_path = cache_path.with_suffix(".lbs")
+            try:
+                self.label_store = LabelStore(store_path)
+            except (OSError, AssertionError):  # not built yet, or by an older version
+                self.label_store = LabelStore.build(self.label_files, store_path, prefix)
         try:
             cache, exists = np.load(cache_path, allow_pickle=True).item(), True  # load dict
             assert cache["version"] == self.cache_version  # matches current version
-            assert cache["hash"] == get_hash(self.label_files + self.im_files)  # identical hash
+            stats = self.file_stats()
+            files = cache["files"]
+            if len(files) != len(stats) or any(files.get(f, (None,))[0] != st for f, st in zip(self.im_files, stats)):
+                cache, exists = self.cache_labels(cache_path, prefix, cache, stats), False  # verify changes only
         except Exception:
             cache, exists = self.cache_labels(cache_path, prefix), False  # run cache ops
 
@@ -611,7 +877,7 @@ class LoadImagesAndLabels(Dataset):
         assert nf > 0 or not augment, f"{prefix}No labels found in {cache_path}, can not start training. {HELP_URL}"
 
         # Read cache
-        [cache.pop(k) for k in ("hash", "version", "msgs")]  # remove items
+        [cache.pop(k) for k in ("version", "msgs", "files")]  # remove items
         labels, shapes, self.segments = zip(*cache.values())
         nl = len(np.concatenate(labels, 0))  # number of labels
         assert nl > 0 or not augment, f"{prefix}All labels empty in {cache_path}, can not start training. {HELP_URL}"
@@ -680,25 +946,50 @@ class LoadImagesAndLabels(Dataset):
             self.batch_shapes = np.ceil(np.array(shapes) * img_size / stride + pad).astype(int) * stride
 
         # Cache images into RAM/disk for faster training
-        if cache_images == "ram" and not self.check_cache_ram(prefix=prefix):
-            cache_images = False
-        self.ims = [None] * n
+        self.image_cache = None  # shared RAM cache
         self.npy_files = [Path(f).with_suffix(".npy") for f in self.im_files]
-        if cache_images:
+        if cache_images == "ram":  # one memory-mapped file for all ranks and workers
+            self.image_cache = self.shared_image_cache(cache_path, prefix)
+        elif cache_images:  # 'disk'
             b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
-            self.im_hw0, self.im_hw = [None] * n, [None] * n
-            fcn = self.cache_images_to_disk if cache_images == "disk" else self.load_image
-            results = ThreadPool(NUM_THREADS).imap(lambda i: (i, fcn(i)), self.indices)
+            results = ThreadPool(NUM_THREADS).imap(lambda i: (i, self.cache_images_to_disk(i)), self.indices)
             pbar = tqdm(results, total=len(self.indices), bar_format=TQDM_BAR_FORMAT, disable=LOCAL_RANK > 0)
             for i, x in pbar:
-                if cache_images == "disk":
-                    b += self.npy_files[i].stat().st_size
-                else:  # 'ram'
-                    self.ims[i], self.im_hw0[i], self.im_hw[i] = x  # im, hw_orig, hw_resized = load_image(self, i)
-                    b += self.ims[i].nbytes * WORLD_SIZE
+                b += self.npy_files[i].stat().st_size
                 pbar.desc = f"{prefix}Caching images ({b / gb:.1f}GB {cache_images})"
             pbar.close()
 
+    def shared_image_cache(self, cache_path, prefix=""):
+        """
+        Opens the shared RAM cache of this run, building it if needed, or returns None if RAM is short.
+
+        The cache holds all images (not only this rank's), resized to img_size, in RAM_CACHE_DIR (/dev/shm) when it
+        has room, otherwise next to the labels cache. It lives for one run: built by local rank 0, opened by the other
+        ranks and the dataloader workers, and deleted when local rank 0 exits, so the next run builds it again. A cache
+        of the same name (dataset, img_size, augment and image files) already exists only if a concurrent run is using
+        it or a crashed run left it behind. Older caches of the dataset and temp files of interrupted builds are
+        removed.
+        """
+        name = hashlib.sha256(f"{Path(cache_path).resolve()}{self.img_size}{self.augment}".encode()).hexdigest()[:12]
+        name = f"{Path(cache_path).stem}-{name}"
+        file = f"{name}-{get_hash(self.im_files)[:12]}.ims"
+        dirs = [Path(RAM_CACHE_DIR)] if os.path.isdir(RAM_CACHE_DIR) else []
+        dirs.append(Path(cache_path).parent)
+        for d in dirs:
+            if (d / file).exists():
+                return ImageCache(d / file).remove_at_exit()
+
+        if not self.check_cache_ram(prefix=prefix):
+            return None
+        h, w = self.shapes[:, 1], self.shapes[:, 0]
+        r = self.img_size / np.maximum(h, w)
+        required = int((np.ceil(h * r) * np.ceil(w * r) * 3).sum() * 1.1)  # bytes, 10% margin
+        d = next((d for d in dirs if shutil.disk_usage(d).free > required), dirs[-1])
+        for f in d.glob(f"{name}-*.ims*"):  # stale caches of this dataset and *.ims.<pid>.tmp files
+            if f.name != file and not (f.suffix == ".tmp" and ImageCache.building(f)):
+                f.unlink(missing_ok=True)
+        return ImageCache.build(d / file, self.n, self.load_image, prefix).remove_at_exit()
+
     def check_cache_ram(self, safety_margin=0.1, prefix=""):
         """Checks if available RAM is sufficient for caching images, adjusting for a safety margin."""
         b, gb = 0, 1 << 30  # bytes of cached images, bytes per gigabytes
@@ -718,37 +1009,75 @@ class LoadImagesAndLabels(Dataset):
             )
         return cache
 
-    def cache_labels(self, path=Path("./labels.cache"), prefix=""):
-        """Caches dataset labels, verifies images, reads shapes, and tracks dataset integrity."""
+    def file_stats(self):
+        """Returns ((mtime, size) of the image, (mtime, size) of its labels) per image, stat-ed in parallel."""
+
+        def stat(f):
+            try:
+                st = os.stat(f)
+                return st.st_mtime_ns, st.st_size
+            except OSError:
+                return None
+
+        with ThreadPool(NUM_THREADS) as pool:
+            im_stats = pool.map(stat, self.im_files)
+            lb_stats = pool.map(stat, self.label_files)  # also with a label store, which may be older than a label
+        return list(zip(im_stats, lb_stats))
+
+    def cache_labels(self, path=Path("./labels.cache"), prefix="", previous=None, stats=None):
+        """
+        Caches dataset labels, verifies images, reads shapes, and tracks dataset integrity.
+
+        Each image is keyed by its path and the mtime and size of its image and label files (`stats`, from
+        file_stats). With a `previous` cache, only new or modified images are verified again and the entries of all
+        other images are reused.
+        """
         x = {}  # dict
         nm, nf, ne, nc, msgs = 0, 0, 0, 0, []  # number missing, found, empty, corrupt, messages
         desc = f"{prefix}Scanning {path.parent / path.stem}..."
-        with Pool(NUM_THREADS) as pool:
-            pbar = tqdm(
-                pool.imap(verify_image_label, zip(self.im_files, self.label_files, repeat(prefix))),
-                desc=desc,
-                total=len(self.im_files),
-                bar_format=TQDM_BAR_FORMAT,
-            )
-            for im_file, lb, shape, segments, nm_f, nf_f, ne_f, nc_f, msg in pbar:
-                nm += nm_f
-                nf += nf_f
-                ne += ne_f
-                nc += nc_f
-                if im_file:
-                    x[im_file] = [lb, shape, segments]
-                if msg:
-                    msgs.append(msg)
-                pbar.desc = f"{desc} {nf} images, {nm + ne} backgrounds, {nc} corrupt"
-
-        pbar.close()
+        stats = stats or self.file_stats()
+        old = previous.get("files", {}) if previous else {}
+        todo = [i for i, f in enumerate(self.im_files) if f not in old or old[f][0] != stats[i]]
+        if previous:
+            LOGGER.info(f"{prefix}{len(todo)}/{len(self.im_files)} images new or modified since {path}")
+        if self.label_store is not None:  # current labels come from the store, the others from their label file
+            packed = [self.label_store.current(self.label_files[i], stats[i][1]) for i in todo]
+        else:
+            packed = repeat(None)
+
+        verified = {}  # image file -> (entry, counts, message)
+        if todo:
+            with Pool(NUM_THREADS) as pool:
+                im_files, label_files = [self.im_files[i] for i in todo], [self.label_files[i] for i in todo]
+                args = zip(im_files, label_files, repeat(prefix), packed)
+                pbar = tqdm(pool.imap(verify_image_label, args), desc=desc, total=len(todo), bar_format=TQDM_BAR_FORMAT)
+                for i, (im_file, lb, shape, segments, nm_f, nf_f, ne_f, nc_f, msg) in zip(todo, pbar):
+                    entry = [lb, shape, segments] if im_file else None
+                    verified[self.im_files[i]] = entry, (nm_f, nf_f, ne_f, nc_f), msg
+                    pbar.desc = f"{desc} {len(verified)} images verified"
+            pbar.close()
+
+        files = {}  # image file -> ((image stat, label stat), counts, message), for the next incremental update
+        for f, st in zip(self.im_files, stats):
+            if f in verified:
+                entry, counts, msg = verified[f]
+            else:  # unchanged, reuse the previous result
+                _, counts, msg = old[f]
+                entry = previous.get(f)
+            if entry is not None:
+                x[f] = entry
+            files[f] = st, counts, msg
+            nm, nf, ne, nc = nm + counts[0], nf + counts[1], ne + counts[2], nc + counts[3]
+            if msg:
+                msgs.append(msg)
+
         if msgs:
             LOGGER.info("\n".join(msgs))
         if nf == 0:
             LOGGER.warning(f"{prefix}WARNING ⚠️ No labels found in {path}. {HELP_URL}")
-        x["hash"] = get_hash(self.label_files + self.im_files)
         x["results"] = nf, nm, ne, nc, len(self.im_files)
         x["msgs"] = msgs  # warnings
+        x["files"] = files
         x["version"] = self.cache_version  # cache version
         try:
             np.save(path, x)  # save cache for next time
@@ -851,24 +1180,20 @@ class LoadImagesAndLabels(Dataset):
 
         Returns (im, original hw, resized hw)
         """
-        im, f, fn = (
-            self.ims[i],
-            self.im_files[i],
-            self.npy_files[i],
-        )
-        if im is None:  # not cached in RAM
-            if fn.exists():  # load npy
-                im = np.load(fn)
-            else:  # read image
-                im = cv2.imread(f)  # BGR
-                assert im is not None, f"Image Not Found {f}"
-            h0, w0 = im.shape[:2]  # orig hw
-            r = self.img_size / max(h0, w0)  # ratio
-            if r != 1:  # if sizes are not equal
-                interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
-                im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
-            return im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
-        return self.ims[i], self.im_hw0[i], self.im_hw[i]  # im, hw_original, hw_resized
+        f, fn = self.im_files[i], self.npy_files[i]
+        if self.image_cache is not None:  # shared RAM cache
+            return self.image_cache.get(i)
+        if fn.exists():  # load npy
+            im = np.load(fn)
+        else:  # read image
+            im = cv2.imread(f)  # BGR
+            assert im is not None, f"Image Not Found {f}"
+        h0, w0 = im.shape[:2]  # orig hw
+        r = self.img_size / max(h0, w0)  # ratio
+        if r != 1:  # if sizes are not equal
+            interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
+            im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
+        return im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
 
     def cache_images_to_disk(self, i):
         """Saves an image to disk as an *.npy file for quicker loading, identified by index `i`."""
@@ -1054,6 +1379,167 @@ class LoadImagesAndLabels(Dataset):
         return torch.stack(im4, 0), torch.cat(label4, 0), path4, shapes4
 
 
+class LoadShards(IterableDataset, LoadImagesAndLabels):
+    """
+    Streams a dataset written by build_shards(): tar shards of JPEG bytes, labels and shape, read front to back.
+
+    Each DDP rank and dataloader worker reads its own contiguous run of the epoch's samples (in the epoch's shard
+    order) sequentially, so every sample is read once and throughput from network or object storage is bound by
+    sequential reads instead of per-file IOPS. Samples go through a shuffle buffer, and mosaic/mixup partners are drawn
+    from that buffer. Every rank yields the same number of samples per epoch.
+    """
+
+    def __init__(
+        self,
+        path,
+        img_size=640,
+        batch_size=16,
+        augment=False,
+        hyp=None,
+        single_cls=False,
+        stride=32,
+        pad=0.0,
+        prefix="",
+        rank=-1,
+        seed=0,
+        shuffle=False,
+        buffer=1000,
+    ):
+        """Reads the shard index at `path` (a shards directory, its index.json or an index URL)."""
+        self.img_size = img_size
+        self.augment = augment
+        self.hyp = hyp
+        self.image_weights = False
+        self.rect = False
+        self.mosaic = self.augment  # mosaic partners come from the shuffle buffer
+        self.mosaic_border = [-img_size // 2, -img_size // 2]
+        self.stride = stride
+        self.path = path
+        self.albumentations = Albumentations(size=img_size) if augment else None
+        self.single_cls = single_cls
+        self.rank = rank
+        self.seed = seed
+        self.shuffle = shuffle
+        self.buffer = buffer if shuffle else 1  # 1 keeps the stored order
+        self.epoch = 0
+
+        index_file = shard_index(path)
+        try:
+            with self.open_shard(index_file) as f:
+                index = json.loads(f.read())
+        except Exception as e:
+            raise Exception(f"{prefix}Error loading shard index {index_file}: {e}\n{HELP_URL}") from e
+        base = index_file.rsplit("/", 1)[0] + "/" if is_stream_url(index_file) else os.path.dirname(index_file)
+        self.shards = [
+            urljoin(base, s["file"]) if is_stream_url(index_file) else os.path.join(base, s["file"])
+            for s in index["shards"]
+        ]
+        self.counts = [s["count"] for s in index["shards"]]
+        self.n = index["n"]
+        assert sum(self.counts) == self.n, f"{prefix}{index_file}: shards hold {sum(self.counts)} samples, n={self.n}"
+        self.im_files = index.get("files") or [f"{i:09d}.jpg" for i in range(self.n)]  # sample keys in older indices
+        self.shapes = np.array(index["shapes"], dtype=np.float64)  # wh
+        self.labels = [np.array(x, dtype=np.float32).reshape(-1, 5) for x in index["labels"]]
+        if single_cls:
+            for lb in self.labels:
+                lb[:, 0] = 0
+        assert self.n > 0 or not augment, f"{prefix}No images in {index_file}, can not start training. {HELP_URL}"
+        LOGGER.info(f"{prefix}Streaming {self.n} images from {len(self.shards)} shards in {index_file}")
+
+    def __len__(self):
+        """Returns the number of images yielded per epoch by this rank."""
+        return self.n // WORLD_SIZE if self.rank > -1 else self.n
+
+    def set_epoch(self, epoch):
+        """Sets the epoch, which seeds the shard order so all ranks and workers agree on it."""
+        self.epoch = epoch
+
+    @staticmethod
+    def open_shard(url):
+        """Opens a local shard (or index) file, or an http(s) URL, for sequential reading."""
+        if is_stream_url(url):
+            return urllib.request.urlopen(url, timeout=60)
+        return open(url, "rb", buffering=1 << 20)
+
+    def read_shard(self, url):
+        """Yields (jpeg bytes, labels, segments, file name) per sample of a shard, reading it front to back."""
+        with self.open_shard(url) as f, tarfile.open(fileobj=f, mode="r|") as tar:
+            key, sample = None, {}
+            for member in tar:
+                if not member.isfile():
+                    continue
+                k, ext = os.path.basename(member.name).split(".", 1)
+                if k != key and sample:
+                    yield self.decode_sample(sample)
+                    sample = {}
+                key, sample[ext] = k, tar.extractfile(member).read()
+            if sample:
+                yield self.decode_sample(sample)
+
+    def decode_sample(self, sample):
+        """Parses the members of one sample into (jpeg bytes, labels, segments, file name)."""
+        meta = json.loads(sample.get("json", b"{}"))
+        lb, segments = parse_labels(sample.get("txt", b"").decode())
+        lb = lb.reshape(-1, 5) if lb.size else np.zeros((0, 5), dtype=np.float32)
+        if self.single_cls:
+            lb[:, 0] = 0
+        return sample["jpg"], lb, segments, meta.get("file", "")
+
+    def samples(self):
+        """Yields this rank's and worker's share of the epoch, a contiguous run of the epoch's samples."""
+        info = torch.utils.data.get_worker_info()
+        nw, worker = (info.num_workers, info.id) if info else (1, 0)
+        rank = RANK if self.rank > -1 else 0
+        n = len(self)  # samples per rank, the remainder of the epoch is dropped
+        start = rank * n + worker * (n // nw) + min(worker, n % nw)
+        stop = start + n // nw + (worker < n % nw)
+
+        order = list(range(len(self.shards)))
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(order)  # same order on all ranks and workers
+        offset = 0  # epoch position of the first sample of shard s
+        for s in order:
+            lo, hi = max(start - offset, 0), min(stop - offset, self.counts[s])
+            if lo < hi:
+                read = 0
+                for sample in islice(self.read_shard(self.shards[s]), lo, hi):  # samples before lo are skipped
+                    yield sample
+                    read += 1
+                assert read == hi - lo, f"{self.shards[s]}: {lo + read} samples, index lists {self.counts[s]}"
+            offset += self.counts[s]
+            if offset >= stop:
+                return
+
+    def __iter__(self):
+        """Streams samples through the shuffle buffer and yields them augmented like LoadImagesAndLabels items."""
+        window = copy.copy(self)  # holds the buffered samples, indexed like a map-style dataset
+        window.jpegs, window.labels, window.segments, window.im_files, window.indices = [], [], [], [], []
+        buffers = window.jpegs, window.labels, window.segments, window.im_files
+        for sample in self.samples():
+            if len(window.indices) < self.buffer:
+                window.indices.append(len(window.indices))
+                for b, x in zip(buffers, sample):
+                    b.append(x)
+                continue
+            j = random.randrange(self.buffer) if self.shuffle else 0
+            yield LoadImagesAndLabels.__getitem__(window, j)
+            for b, x in zip(buffers, sample):
+                b[j] = x
+        for j in random.sample(window.indices, len(window.indices)) if self.shuffle else window.indices:
+            yield LoadImagesAndLabels.__getitem__(window, j)
+
+    def load_image(self, i):
+        """Decodes buffered image `i`, returning the image, its original dimensions, and resized dimensions."""
+        im = cv2.imdecode(np.frombuffer(self.jpegs[i], dtype=np.uint8), cv2.IMREAD_COLOR)  # BGR
+        assert im is not None, f"Image Not Decoded {self.im_files[i]}"
+        h0, w0 = im.shape[:2]  # orig hw
+        r = self.img_size / max(h0, w0)  # ratio
+        if r != 1:  # if sizes are not equal
+            interp = cv2.INTER_LINEAR if (self.augment or r > 1) else cv2.INTER_AREA
+            im = cv2.resize(im, (math.ceil(w0 * r), math.ceil(h0 * r)), interpolation=interp)
+        return im, (h0, w0), im.shape[:2]  # im, hw_original, hw_resized
+
+
 # Ancillary functions --------------------------------------------------------------------------------------------------
 def flatten_recursive(path=DATASETS_DIR / "coco128"):
     """Flattens a directory by copying all files from subdirectories to a new top-level directory, preserving
@@ -1133,9 +1619,88 @@ def autosplit(path=DATASETS_DIR / "coco128/images", weights=(0.9, 0.1, 0.0), ann
                 f.write(f"./{img.relative_to(path.parent).as_posix()}" + "\n")  # add image to txt file
 
 
+def build_shards(
+    path=DATASETS_DIR / "coco128/images/train2017", output=None, shard_size=1000, max_bytes=1 << 30, quality=95
+):
+    """
+    Writes a dataset as tar shards for LoadShards, plus an index.json listing the shards, image shapes and labels.
+
+    Each sample is three members sharing a key: JPEG bytes (`.jpg`, JPEGs are stored as is, other formats and
+    EXIF-rotated images are re-encoded), YOLO labels (`.txt`) and the original shape and file (`.json`). Samples are
+    shuffled across shards so sequential reads are not sorted by source. Train on the result by pointing the dataset
+    yaml at the shards directory.
+
+    Usage: from utils.dataloaders import *; build_shards('../datasets/coco128/images/train2017')
+
+    Arguments:
+        path:        Images directory or *.txt image list, labels are found and verified like LoadImagesAndLabels
+        output:      Shards directory, defaults to `{path}_shards`
+        shard_size:  Maximum images per shard
+        max_bytes:   Maximum bytes per shard
+        quality:     JPEG quality of re-encoded images
+    """
+    dataset = LoadImagesAndLabels(path, prefix="shards: ")  # verified images, labels, shapes and segments
+    p = Path(path)
+    output = Path(output or f"{p.with_suffix('') if p.is_file() else p}_shards")
+    output.mkdir(parents=True, exist_ok=True)
+    for f in output.glob("shard-*.tar"):
+        f.unlink()  # remove existing
+
+    def encode(i):
+        """Returns the JPEG bytes, label text and metadata of image `i`."""
+        f = dataset.im_files[i]
+        with open(f, "rb") as fh:
+            data = fh.read()
+        if f.rsplit(".", 1)[-1].lower() not in ("jpg", "jpeg") or Image.open(io.BytesIO(data)).getexif().get(
+            orientation, 1
+        ) != 1:
+            data = cv2.imencode(".jpg", cv2.imread(f), [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        lb, segments = dataset.labels[i], dataset.segments[i]
+        rows = [[c, *s.ravel()] for c, s in zip(lb[:, 0], segments)] if len(segments) else lb.tolist()
+        text = "".join(f"{int(x[0])} " + " ".join(f"{v:.6g}" for v in x[1:]) + "\n" for x in rows)
+        meta = {"shape": [int(dataset.shapes[i][1]), int(dataset.shapes[i][0])], "file": f}  # hw
+        return data, text.encode(), json.dumps(meta).encode()
+
+    order = np.random.RandomState(0).permutation(dataset.n)  # for reproducibility
+    shards, tar, count, size = [], None, 0, 0
+    with ThreadPool(NUM_THREADS) as pool:
+        for key, members in enumerate(tqdm(pool.imap(encode, order), total=dataset.n, bar_format=TQDM_BAR_FORMAT)):
+            if tar is None:
+                name = f"shard-{len(shards):06d}.tar"
+                tar, count, size = tarfile.open(output / f"{name}.tmp", "w"), 0, 0
+            for ext, data in zip(("jpg", "txt", "json"), members):
+                info = tarfile.TarInfo(f"{key:09d}.{ext}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+                size += len(data)
+            count += 1
+            if count >= shard_size or size >= max_bytes or key == dataset.n - 1:
+                tar.close()
+                (output / f"{name}.tmp").replace(output / name)
+                shards.append({"file": name, "count": count, "bytes": (output / name).stat().st_size})
+                tar = None
+
+    index = {
+        "n": dataset.n,
+        "shards": shards,
+        "shapes": dataset.shapes[order].tolist(),  # wh
+        "files": [dataset.im_files[i] for i in order],
+        "labels": [dataset.labels[i].round(6).tolist() for i in order],
+    }
+    with open(output / SHARD_INDEX, "w") as f:
+        json.dump(index, f)
+    gb = sum(s["bytes"] for s in shards) / (1 << 30)
+    LOGGER.info(f"shards: {dataset.n} images written to {len(shards)} shards ({gb:.2f}GB) in {output}")
+    return output / SHARD_INDEX
+
+
 def verify_image_label(args):
-    """Verifies a single image-label pair, ensuring image format, size, and legal label values."""
-    im_file, lb_file, prefix = args
+    """
+    Verifies a single image-label pair, ensuring image format, size, and legal label values.
+
+    `packed` holds the labels when they come from a LabelStore, or None to read `lb_file`.
+    """
+    im_file, lb_file, prefix, packed = args if len(args) == 4 else (*args, None)
     nm, nf, ne, nc, msg, segments = 0, 0, 0, 0, "", []  # number (missing, found, empty, corrupt), message, segments
     try:
         # verify images
@@ -1152,15 +1717,10 @@ def verify_image_label(args):
                     msg = f"{prefix}WARNING ⚠️ {im_file}: corrupt JPEG restored and saved"
 
         # verify labels
-        if os.path.isfile(lb_file):
+        found = packed is not None or os.path.isfile(lb_file)
+        if found:
             nf = 1  # label found
-            with open(lb_file) as f:
-                lb = [x.split() for x in f.read().strip().splitlines() if len(x)]
-                if any(len(x) > 6 for x in lb):  # is segment
-                    classes = np.array([x[0] for x in lb], dtype=np.float32)
-                    segments = [np.array(x[1:], dtype=np.float32).reshape(-1, 2) for x in lb]  # (cls, xy1...)
-                    lb = np.concatenate((classes.reshape(-1, 1), segments2boxes(segments)), 1)  # (cls, xywh)
-                lb = np.array(lb, dtype=np.float32)
+            lb, segments = read_label_file(lb_file) if packed is None else (packed, [])
             nl = len(lb)
             if nl:
                 assert lb.shape[1] == 5, f"labels require 5 columns, {lb.shape[1]} columns detected"